@@ -0,0 +1,41 @@
+# =============================================================================
+# 
+# Copyright (C) 2011 Asymworks, LLC.  All Rights Reserved.
+# www.pydivelog.com / info@pydivelog.com
+# 
+# This file is part of the Python Dive Logbook (pyDiveLog)
+# 
+# This file may be used under the terms of the GNU General Public
+# License version 2.0 as published by the Free Software Foundation
+# and appearing in the file license.txt included in the packaging of
+# this file.  Please review this information to ensure GNU
+# General Public Licensing requirements will be met.
+# 
+# This file is provided AS IS with NO WARRANTY OF ANY KIND, INCLUDING THE
+# WARRANTY OF DESIGN, MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+# 
+# =============================================================================
+
+
+from sqlalchemy import Column, ForeignKey, LargeBinary, MetaData, Integer, \
+    String, Table
+from migrate import *
+
+meta = MetaData()
+
+# Raw Dive Data Table
+raw_dives = Table('raw_dives', meta,
+    Column('id', Integer, primary_key=True),
+    Column('dive_id', Integer, ForeignKey('dives.id'), nullable=False),
+    Column('parser', String(255)),
+    Column('data', LargeBinary, nullable=False)
+)
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    Table('dives', meta, autoload=True)
+    raw_dives.create()
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    raw_dives.drop()
@@ -0,0 +1,37 @@
+# =============================================================================
+# 
+# Copyright (C) 2011 Asymworks, LLC.  All Rights Reserved.
+# www.pydivelog.com / info@pydivelog.com
+# 
+# This file is part of the Python Dive Logbook (pyDiveLog)
+# 
+# This file may be used under the terms of the GNU General Public
+# License version 2.0 as published by the Free Software Foundation
+# and appearing in the file license.txt included in the packaging of
+# this file.  Please review this information to ensure GNU
+# General Public Licensing requirements will be met.
+# 
+# This file is provided AS IS with NO WARRANTY OF ANY KIND, INCLUDING THE
+# WARRANTY OF DESIGN, MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
+# 
+# =============================================================================
+
+
+from sqlalchemy import MetaData, Table
+from migrate import *
+
+meta = MetaData()
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    dives = Table('dives', meta, autoload=True)
+    dives.c.repetition.alter(nullable=True)
+    dives.c.interval.alter(nullable=True)
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    dives = Table('dives', meta, autoload=True)
+    dives.update().where(dives.c.repetition == None).values(repetition=1).execute()
+    dives.update().where(dives.c.interval == None).values(interval=0).execute()
+    dives.c.repetition.alter(nullable=False)
+    dives.c.interval.alter(nullable=False)
@@ -32,6 +32,9 @@ class Dive(object):
     BackRefs:
     - dive_site : <DiveSite> (via site_id)
     - computer : <DiveComputer> (via computer_id)
+    
+    Relationships:
+    - raw : <RawDive>
     '''
     
     #TODO: Link to Mixes
@@ -51,19 +54,64 @@ class Dive(object):
         self.min_temp = adapter.min_temp()
         
         self.profile = adapter.profile()
+        self.profile_scale = adapter.profile_scale()
         self.vendor = adapter.vendor()
         
         self.inserted = datetime.now()
         self.comments = None
         self.rating = None
         
+    def scaled_profile(self):
+        '''
+        Return the profile in default units
+        
+        Profiles may be stored with fixed-point integer values, in which case
+        the profile_scale property maps each profile key to its scale.  This 
+        method returns a copy of the profile with those values converted to 
+        floating-point numbers in the default units.
+        '''
+        if not self.profile_scale:
+            return self.profile
+        
+        scale = [(k, float(v)) for (k, v) in self.profile_scale.items()]
+        profile = []
+        for wp in self.profile:
+            wp = dict(wp)
+            for (k, v) in scale:
+                if wp.get(k) is not None:
+                    wp[k] = wp[k] / v
+            profile.append(wp)
+        
+        return profile
+    
     def __repr__(self):
         return '<Dive %d (%s)>' % (self.id, self.dive_datetime.date().strftime('%x'))
 
+# Raw Dive Model
+class RawDive(object):
+    '''
+    RawDive Model
+    
+    Contains the unmodified bytes of a single dive as returned by the dive 
+    computer driver, along with the name of the parser used to parse it, so
+    that the dive can be re-parsed later without downloading it again.
+    
+    BackRefs:
+    - dive : <Dive> (via dive_id)
+    '''
+    
+    def __repr__(self):
+        return '<RawDive %d (%d bytes)>' % (self.id, len(self.data))
+
+# Raw Dive Mapper
+mapper(RawDive, tables.raw_dives)
+
 # Dive Mapper
 mapper(Dive, tables.dives, properties={
     'profile': deferred(tables.dives.c.profile),
-    'vendor': deferred(tables.dives.c.vendor)
+    'vendor': deferred(tables.dives.c.vendor),
+    'raw': relationship(RawDive, uselist=False, cascade='all, delete-orphan',
+        backref='dive')
 })
 
 # Dive Computer Model
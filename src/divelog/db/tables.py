@@ -17,7 +17,7 @@
 # =============================================================================
 
 from sqlalchemy import Boolean, Column, DateTime, Enum, Float, \
-    ForeignKey, MetaData, Integer, String, Table, Text
+    ForeignKey, LargeBinary, MetaData, Integer, String, Table, Text
 from types import JsonType, CountryType
 
 # Declare global meta-data
@@ -45,8 +45,8 @@ dives = Table('dives', meta,
     Column('dive_datetime', DateTime, nullable=False),
     Column('site_id', Integer, ForeignKey('sites.id')),
     Column('computer_id', Integer, ForeignKey('computers.id')),
-    Column('repetition', Integer, nullable=False),
-    Column('interval', Integer, nullable=False),
+    Column('repetition', Integer),
+    Column('interval', Integer),
     Column('duration', Integer, nullable=False),
     Column('max_depth', Float, nullable=False),
     Column('avg_depth', Float),
@@ -54,6 +54,7 @@ dives = Table('dives', meta,
     Column('max_temp', Float),
     Column('min_temp', Float),
     Column('profile', JsonType),
+    Column('profile_scale', JsonType),
     Column('vendor', JsonType),
     Column('imported', DateTime),
     
@@ -77,6 +78,14 @@ dives = Table('dives', meta,
     Column('safety_stop', Boolean),
 )
 
+# Raw Dive Data Table
+raw_dives = Table('raw_dives', meta,
+    Column('id', Integer, primary_key=True),
+    Column('dive_id', Integer, ForeignKey('dives.id'), nullable=False),
+    Column('parser', String(255)),
+    Column('data', LargeBinary, nullable=False)
+)
+
 # Dive Site Table
 sites = Table('sites', meta,
     Column('id', Integer, primary_key=True),
@@ -35,12 +35,13 @@ and `pySerial <http://pyserial.sourceforge.net>` to implement IrDA and RS-232
 communication protocols.  
 '''
 
+import cPickle as pickle
 import logging
 
 __version__ = '0.1.3'
 __all__ = [ 'BaseDriver', 'register_driver', 'list_drivers', 
             'BaseParser', 'register_parser', 'list_parsers',
-            'BaseAdapter',
+            'BaseAdapter', 'parse_many',
 ]
 
 log = logging.getLogger(__name__)
@@ -164,6 +165,20 @@ class BaseAdapter(object):
         Note that to correspond with UDDF guidelines (and to make the job of the
         GUI easier), all defined profiles must appear in each waypoint, even if
         the value does not change from one sample to the next.
+        
+        Adapters may return some values as fixed-point integers rather than in
+        the default units; see the profile_scale() method.
+        '''
+    
+    def profile_scale(self):
+        '''
+        Profile Fixed-Point Scale
+        
+        The return value should be None if all profile values are in the 
+        default units listed in profile().  Otherwise it should be a dictionary
+        which maps profile keys to an integer scale, where the value in default
+        units is the profile value divided by the scale.  For example, depths
+        stored in centimeters have the scale {'depth': 100}.
         '''
     
     def vendor(self):
@@ -318,6 +333,126 @@ def list_parsers():
     '''Return the Parser registry'''
     return _parser_registry
 
+# Per-process parser cache used by parse_many() workers
+_worker_parsers = {}
+
+def _parse_one(job):
+    '''Parse a single dive blob, returning a (result, error) tuple'''
+    (name, args, kwargs, data) = job
+    key = (name, args)
+    try:
+        if key not in _worker_parsers:
+            _worker_parsers[key] = _parser_registry[name]['class'](*args)
+        return (_worker_parsers[key].parse(data, **kwargs), None)
+    
+    except Exception, e:
+        return (None, e)
+
+def _parse_pickled(job):
+    '''
+    Parse a single dive blob in a worker process
+    
+    The result is pickled in the worker, so that a result which cannot be 
+    pickled is returned as the error of its own dive instead of failing the
+    whole batch.
+    '''
+    (result, error) = _parse_one(job)
+    if error is not None:
+        return (None, error)
+    
+    try:
+        return (pickle.dumps(result, pickle.HIGHEST_PROTOCOL), None)
+    except Exception, e:
+        return (None, e)
+
+# Parse a batch of dives in parallel
+def parse_many(name, blobs, workers=None, chunksize=16, args=(), cache=None, **kwargs):
+    '''
+    Parse a batch of raw dives in parallel
+    
+    Parses each raw dive in 'blobs' with the parser registered as 'name' (see
+    list_parsers()), wrapping each result in the parser's adapter class if one
+    is registered.  The 'args' tuple is passed to the parser constructor and
+    any keyword arguments are passed to the parse() method.
+    
+    The dives are distributed across a pool of 'workers' processes (default
+    is one per CPU) in batches of 'chunksize' dives; each worker constructs 
+    its own parser instance.  If 'workers' is 1 the dives are parsed in the 
+    calling process.  Workers also pass the parser's WORKER_KWARGS (if any) 
+    to parse(), which select a compact result which is cheap to send back to
+    the calling process, where it is adapted.  Results must be picklable, so
+    the 'lazy_profile' keyword argument is only accepted if 'workers' is 1.
+    
+    Returns a list with one (result, error) tuple for each blob, in the same
+    order as 'blobs'.  If a dive fails to parse, result is None and error is
+    the exception that was raised; otherwise error is None.
+    
+    If 'cache' is a divelog.dc.cache.ParseCache, dives found in the cache are
+    returned as CachedAdapter objects without being parsed, and the results 
+    of the remaining dives are added to the cache.  Results are cached per 
+    'args' and keyword arguments, so a result parsed with different options
+    is never returned.  The parser must have an adapter to use the cache.
+    '''
+    if name not in _parser_registry:
+        raise KeyError("Parser '%s' is not registered" % name)
+    if kwargs.get('lazy_profile') and workers != 1:
+        raise ValueError('Lazy profiles cannot be returned from worker processes')
+    
+    p = _parser_registry[name]
+    args = tuple(args)
+    blobs = list(blobs)
+    results = [None] * len(blobs)
+    if cache is not None:
+        for (i, data) in enumerate(blobs):
+            adapter = cache.get(name, data, args, **kwargs)
+            if adapter is not None:
+                results[i] = (adapter, None)
+    
+    todo = [i for i in xrange(len(blobs)) if results[i] is None]
+    if workers == 1 or len(todo) <= 1:
+        parsed = [_parse_one((name, args, kwargs, blobs[i])) for i in todo]
+    else:
+        import multiprocessing
+        wkwargs = dict(getattr(p['class'], 'WORKER_KWARGS', {}), **kwargs)
+        jobs = [(name, args, wkwargs, blobs[i]) for i in todo]
+        pool = multiprocessing.Pool(workers)
+        try:
+            parsed = pool.map(_parse_pickled, jobs, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+        parsed = [(r if e is not None else pickle.loads(r), e) for (r, e) in parsed]
+    
+    for (i, (result, error)) in zip(todo, parsed):
+        if error is None and p['adapter'] is not None:
+            try:
+                result = p['adapter'](result)
+            except Exception, e:
+                (result, error) = (None, e)
+        
+        results[i] = (result, error)
+        if cache is not None and error is None:
+            cache.put(name, blobs[i], result, args, **kwargs)
+    
+    return results
+
+# Parse the headers of a batch of dives
+def scan_headers(name, blobs, args=()):
+    '''
+    Parse only the headers of a batch of raw dives
+    
+    Parses each raw dive in 'blobs' as parse_many() does, but passes the
+    'profile=False' keyword argument to the parser so that the profile is not
+    decoded, in the calling process.  The header fields (date, duration, 
+    depths, temperatures and gas mixes) are enough to list the dives and to
+    find which are already in the logbook, so that only the new dives need
+    to be fully parsed.
+    
+    Returns a list with one (result, error) tuple for each blob, as in
+    parse_many().
+    '''
+    return parse_many(name, blobs, workers=1, args=args, profile=False)
+
 # Import and Register built-in drivers and parsers
 from divelog.dc.driver import *
 from divelog.dc.driver.uwatec_smart import *
@@ -329,4 +464,9 @@ register_driver(FileDriver)
 register_driver(SmartDriver)
 
 register_parser(NullParser)
-register_parser(AladinTec2G)
\ No newline at end of file
+register_parser(AladinTec2G)
+register_parser(AladinTec)
+register_parser(SmartPro)
+register_parser(SmartCom)
+register_parser(SmartTec)
+register_parser(SmartZ)
\ No newline at end of file
@@ -0,0 +1,195 @@
+#!/usr/bin/env python2
+# =============================================================================
+# 
+# Copyright (C) 2011 Asymworks, LLC.  All Rights Reserved.
+# www.pydivelog.com / info@pydivelog.com
+# 
+# This file is part of the Python divecomputer Package (python-divecomputer)
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# 
+# =============================================================================
+
+'''
+bench_smart.py
+
+Benchmark suite for the Uwatec Smart parser.  Synthetic Aladin Tec 2G dives of
+1k, 10k and 100k samples are generated with SmartEncoder, and the time taken
+by parse(), parse_profile() and SmartAdapter.profile() is measured for each,
+along with the compiled DTI decoder against the bit-at-a-time reference
+implementation (dti_identify() and process_dti() below, which are the 
+original profile decoder of the parser).  Run from the source
+directory, optionally giving the sample counts to test:
+
+    PYTHONPATH=. python divelog/dc/bin/bench_smart.py [samples ...]
+'''
+
+import random
+import struct
+import sys
+import time
+
+from divelog.dc.parser import ParseError
+from divelog.dc.parser.uwatec_smart import AladinTec2G, SmartAdapter
+from divelog.dc.parser.smart_encoder import SmartEncoder
+
+SIZES = [1000, 10000, 100000]
+
+def synthetic_dive(nsamples, seed=0):
+    '''Generate a raw Aladin Tec 2G dive with a random but plausible profile'''
+    rnd = random.Random(seed)
+    depth = [0]
+    temp = [280]
+    alarms = [0]
+    
+    for i in xrange(1, nsamples):
+        k = rnd.random()
+        if k < 0.30:
+            d = depth[-1]                                       # Level
+        elif k < 0.98:
+            d = depth[-1] + 2 * rnd.randint(-10, 10)            # Small Change
+        else:
+            d = depth[-1] + 2 * rnd.randint(-300, 300)          # Large Change
+        depth.append(min(max(d, 0), 10000))
+        
+        if rnd.random() < 0.05:
+            t = temp[-1] + 4 * rnd.randint(-5, 5)
+            temp.append(min(max(t, 0), 400))                    # 0-40 deg C
+        else:
+            temp.append(temp[-1])
+        
+        if rnd.random() < 0.01:
+            alarms.append(rnd.choice([0, 2, 4, 6]))
+        else:
+            alarms.append(alarms[-1])
+    
+    return SmartEncoder(AladinTec2G).encode_dive(depth, temp, alarms, surface=2000)
+
+def dti_identify(data, offset):
+    '''Return the number of '1' bits in the DTI'''
+    nbits = 0
+    for i in range(16):       # Assume 16 bytes max in a DTI
+        byte = struct.unpack_from('<B', data, offset + i)[0]
+        for j in range(8):
+            mask = 1 << (7 - j)
+            if byte & mask == 0:
+                return nbits
+            nbits += 1
+    
+    return -1
+
+def fix_signbit(value, nbits):
+    if nbits == 0 or nbits > 32:
+        return 0
+    
+    sgnbit = (1 << (nbits - 1))
+    mask = (0xFFFFFFFF << nbits) & 0xFFFFFFFF
+    
+    if (value & sgnbit) == sgnbit:
+        return value | mask
+    return value & ~mask
+
+def process_dti(data, cur_pos, dti):
+    # Advance past initial DTI bytes if necessary
+    cur_pos += dti['bits'] / 8
+    nbits = 0
+    value = 0
+    n = dti['bits'] % 8
+    if n > 0:
+        nbits = 8 - n
+        value = (0xFF >> n) & struct.unpack_from('<B', data, cur_pos)[0]
+        
+        if dti['ignore_type_bits']:
+            nbits = 0
+            value = 0
+        
+        cur_pos += 1
+    
+    # Ensure that we have enough bytes remaining
+    if cur_pos + dti['extra'] > len(data):
+        raise ParseError('Unexpected end of data')
+    
+    # Process data bytes
+    for _ in range(dti['extra']):
+        nbits += 8
+        value = value << 8
+        value += struct.unpack_from('<B', data, cur_pos)[0]
+        cur_pos += 1
+    
+    # Fix the Sign Bit
+    svalue = fix_signbit(value, nbits)
+    svalue = struct.unpack('<l', struct.pack('<L', int(svalue)))[0]
+    
+    # Return the Data
+    return (cur_pos, value, svalue)
+
+def decode_reference(parser, data, offset):
+    '''Decode every DTI using the bit-at-a-time reference implementation'''
+    pos = offset
+    while pos < len(data):
+        idx = dti_identify(data, pos)
+        (pos, value, svalue) = process_dti(data, pos, parser.DTI_TABLE[idx])
+
+def decode_compiled(parser, data, offset):
+    '''Decode every DTI using the compiled DTIDecoder'''
+    for (idx, value, svalue) in parser.dti_decoder().iterdecode(data, offset):
+        pass
+
+def parse_profile(parser, data, offset):
+    '''Parse the profile alone with fresh parser state'''
+    parser.init_parser()
+    parser.parse_profile(data, offset)
+
+def adapt_profile(dive):
+    '''Translate a parsed profile with a new adapter'''
+    SmartAdapter(dive).profile()
+
+def timeit(fn, *args):
+    best = None
+    for _ in range(3):
+        t0 = time.time()
+        fn(*args)
+        dt = time.time() - t0
+        if best is None or dt < best:
+            best = dt
+    return best
+
+def main(argv):
+    sizes = [int(n) for n in argv[1:]] or SIZES
+    parser = AladinTec2G()
+    hsize = AladinTec2G.HEADER_SIZE
+    
+    print '%-30s' % 'Samples' + ''.join('%12d' % n for n in sizes)
+    
+    dives = [synthetic_dive(n) for n in sizes]
+    print '%-30s' % 'Dive size [bytes]' + ''.join('%12d' % len(d) for d in dives)
+    
+    parsed = [parser.parse(d) for d in dives]
+    tests = [
+        ('DTI decode (reference)',  lambda i: timeit(decode_reference, parser, dives[i], hsize)),
+        ('DTI decode (compiled)',   lambda i: timeit(decode_compiled, parser, dives[i], hsize)),
+        ('parse_profile',           lambda i: timeit(parse_profile, parser, dives[i], hsize)),
+        ('parse',                   lambda i: timeit(parser.parse, dives[i])),
+        ('parse (no summary)',      lambda i: timeit(lambda d: parser.parse(d, summary=False), dives[i])),
+        ('parse (columns)',         lambda i: timeit(lambda d: parser.parse(d, columns=True), dives[i])),
+        ('parse (rle)',             lambda i: timeit(lambda d: parser.parse(d, rle=True), dives[i])),
+        ('SmartAdapter.profile',    lambda i: timeit(adapt_profile, parsed[i])),
+    ]
+    
+    for (name, fn) in tests:
+        print '%-30s' % (name + ' [ms]') + ''.join('%12.2f' % (fn(i) * 1000) for i in range(len(sizes)))
+
+if __name__ == '__main__':
+    main(sys.argv)
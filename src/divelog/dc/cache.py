@@ -0,0 +1,278 @@
+# =============================================================================
+# 
+# Copyright (C) 2011 Asymworks, LLC.  All Rights Reserved.
+# www.pydivelog.com / info@pydivelog.com
+# 
+# This file is part of the Python divecomputer Package (python-divecomputer)
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# 
+# =============================================================================
+
+'''
+Parse result cache
+
+Implements a content-addressed cache of adapted parse results, stored in a 
+local SQLite file.  Results are keyed by the parser name, the parser VERSION
+attribute, a digest of the parser constructor and parse() arguments and the
+SHA-1 digest of the raw dive data, so that re-importing the same dives skips
+the decode step, and a new parser version or different parse options never 
+return a stale result.  The adapter values are stored with marshal, so the
+cache only holds plain data.
+'''
+
+import datetime
+import hashlib
+import logging
+import marshal
+import sqlite3
+import time
+
+from divelog.dc import BaseAdapter, list_parsers
+
+log = logging.getLogger(__name__)
+
+# Storage format of the cache file, saved as the SQLite user_version
+FORMAT = 2
+
+# Adapter methods saved in the cache
+ADAPTER_METHODS = [
+    'dive_datetime', 'repetition', 'interval', 'duration', 'max_depth', 
+    'avg_depth', 'air_temp', 'max_temp', 'min_temp', 'mixes', 'profile',
+    'profile_scale', 'vendor', 'computer',
+]
+
+class CachedAdapter(BaseAdapter):
+    '''
+    Adapter for a cached parse result
+    
+    Returns the values which were saved from the original adapter.  The data
+    argument is a dictionary keyed by adapter method name.
+    '''
+    def dive_datetime(self):
+        return self._data.get('dive_datetime')
+    
+    def repetition(self):
+        return self._data.get('repetition')
+    
+    def interval(self):
+        return self._data.get('interval')
+    
+    def duration(self):
+        return self._data.get('duration')
+    
+    def max_depth(self):
+        return self._data.get('max_depth')
+    
+    def avg_depth(self):
+        return self._data.get('avg_depth')
+    
+    def air_temp(self):
+        return self._data.get('air_temp')
+    
+    def max_temp(self):
+        return self._data.get('max_temp')
+    
+    def min_temp(self):
+        return self._data.get('min_temp')
+    
+    def mixes(self):
+        return self._data.get('mixes')
+    
+    def profile(self):
+        return self._data.get('profile')
+    
+    def profile_scale(self):
+        return self._data.get('profile_scale')
+    
+    def vendor(self):
+        return self._data.get('vendor')
+    
+    def computer(self):
+        return self._data.get('computer')
+
+def adapter_values(adapter):
+    '''Return a dictionary of the values returned by an adapter'''
+    return dict((m, getattr(adapter, m)()) for m in ADAPTER_METHODS)
+
+def dump_values(values):
+    '''Serialize a dictionary of adapter values'''
+    values = dict(values)
+    dt = values.get('dive_datetime')
+    if dt is not None:
+        values['dive_datetime'] = (dt.year, dt.month, dt.day, dt.hour, 
+            dt.minute, dt.second, dt.microsecond)
+    return marshal.dumps(values, 2)
+
+def load_values(blob):
+    '''Load a dictionary of adapter values saved by dump_values()'''
+    values = marshal.loads(blob)
+    if values.get('dive_datetime') is not None:
+        values['dive_datetime'] = datetime.datetime(*values['dive_datetime'])
+    return values
+
+class ParseCache(object):
+    '''
+    Content-addressed parse result cache
+    
+    Stores adapted parse results in the SQLite file 'filename' (which may be
+    ':memory:').  The cache is limited to 'max_size' bytes of stored results;
+    when it grows beyond this the least recently used results are evicted.
+    
+    The parse() method returns a CachedAdapter for dives which are in the 
+    cache, and otherwise parses and adapts the dive with the registered parser
+    and stores the result.  Results are cached separately for each set of 
+    parser constructor arguments ('args') and parse() keyword arguments, 
+    which must have a stable repr().  The hits, misses and evictions 
+    attributes count cache lookups which were found, lookups which were not 
+    found, and results which were evicted.
+    
+    Lookups do not write to the file; the last use of each result is kept in
+    memory and saved by the next put() or by close(), so the cache must be
+    closed to keep the order of eviction of results which were only read.
+    '''
+    def __init__(self, filename, max_size=64*1024*1024):
+        self._filename = filename
+        self._max_size = max_size
+        self._conn = sqlite3.connect(filename)
+        self._used = {}
+        
+        # Discard caches with an older schema or storage format
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] != FORMAT:
+            if self._conn.execute("SELECT name FROM sqlite_master WHERE name='results'").fetchone():
+                log.info('Discarding parse cache with old format in %s' % filename)
+                self._conn.execute('DROP TABLE results')
+            self._conn.execute('PRAGMA user_version=%d' % FORMAT)
+        
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                parser TEXT NOT NULL,
+                version TEXT NOT NULL,
+                options TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                used REAL NOT NULL,
+                PRIMARY KEY (parser, version, options, digest)
+            )''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        self._conn.commit()
+        
+        self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def key(name, data, args=(), **kwargs):
+        '''
+        Return the cache key (parser, version, options, digest) for a raw dive
+        
+        The options field is a digest of the parser constructor arguments and
+        the parse() keyword arguments.
+        '''
+        cls = list_parsers()[name]['class']
+        options = hashlib.sha1(repr((tuple(args), sorted(kwargs.items())))).hexdigest()
+        return (name, str(getattr(cls, 'VERSION', 0)), options, hashlib.sha1(data).hexdigest())
+    
+    def get(self, name, data, args=(), **kwargs):
+        '''Return the cached CachedAdapter for a raw dive, or None'''
+        key = self.key(name, data, args, **kwargs)
+        row = self._conn.execute('SELECT data FROM results WHERE parser=? AND version=? AND options=? AND digest=?', key).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        self._used[key] = time.time()
+        return CachedAdapter(load_values(str(row[0])))
+    
+    def _save_used(self):
+        '''Write the pending last-use times of cached results'''
+        if self._used:
+            self._conn.executemany('UPDATE results SET used=? WHERE parser=? AND version=? AND options=? AND digest=?', 
+                [(t,) + key for (key, t) in self._used.iteritems()])
+            self._used = {}
+    
+    def put(self, name, data, adapter, args=(), **kwargs):
+        '''Store the adapted parse result for a raw dive'''
+        key = self.key(name, data, args, **kwargs)
+        try:
+            blob = dump_values(adapter_values(adapter))
+        except ValueError, e:
+            log.warning('Not caching result of %s which cannot be stored: %s' % (name, e))
+            return
+        
+        self._save_used()
+        
+        row = self._conn.execute('SELECT size FROM results WHERE parser=? AND version=? AND options=? AND digest=?', key).fetchone()
+        if row is not None:
+            self._size -= row[0]
+        
+        self._conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)', 
+            key + (sqlite3.Binary(blob), len(blob), time.time()))
+        self._size += len(blob)
+        
+        # Evict the least recently used results
+        while self._size > self._max_size:
+            row = self._conn.execute('SELECT parser, version, options, digest, size FROM results ORDER BY used LIMIT 1').fetchone()
+            if row is None:
+                break
+            self._conn.execute('DELETE FROM results WHERE parser=? AND version=? AND options=? AND digest=?', row[:4])
+            self._size -= row[4]
+            self.evictions += 1
+        
+        self._conn.commit()
+    
+    def parse(self, name, data, args=(), **kwargs):
+        '''
+        Return an adapter for a raw dive, parsing it only if it is not cached
+        
+        The dive is parsed with the parser registered as 'name', constructed
+        with 'args' and passed any keyword arguments, and the result is saved
+        through the parser's adapter.
+        '''
+        adapter = self.get(name, data, args, **kwargs)
+        if adapter is None:
+            p = list_parsers()[name]
+            adapter = p['adapter'](p['class'](*args).parse(data, **kwargs))
+            self.put(name, data, adapter, args, **kwargs)
+        return adapter
+    
+    def clear(self):
+        '''Remove all results from the cache'''
+        self._conn.execute('DELETE FROM results')
+        self._conn.commit()
+        self._used = {}
+        self._size = 0
+    
+    def close(self):
+        '''Save the last use of cached results and close the cache file'''
+        if self._conn is None:
+            return
+        
+        self._save_used()
+        self._conn.commit()
+        self._conn.close()
+        self._conn = None
+    
+    @property
+    def size(self):
+        '''Total size of the stored results [bytes]'''
+        return self._size
+    
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
@@ -22,13 +22,14 @@
 # =============================================================================
 
 import datetime
-import pickle
 
 from divelog.dc import BaseDriver
+from divelog.dc.dump import DumpFile
+from divelog.dc.progress import ProgressReporter
 
 class FileDriver(BaseDriver):
     '''
-    File device driver.  Reads data from a pickled file.
+    File device driver.  Reads dives from a dive dump file (see divelog.dc.dump)
     '''
     
     NAME = 'file'
@@ -36,7 +37,7 @@ class FileDriver(BaseDriver):
     
     def __init__(self, filename=None, **kwargs):
         self._filename = filename
-        self._file = None
+        self._dump = None
         
     def discover(self):
         if not self._filename:
@@ -44,25 +45,47 @@ class FileDriver(BaseDriver):
         return [{'addr' : self._filename, 'name' : '<File: %s>' % self._filename}]
     
     def connect(self, device):
-        self._file = open(device['addr'], 'rb')
+        self._dump = DumpFile(device['addr'])
         
     def disconnect(self):
-        self._file.close()
+        if self._dump is not None:
+            self._dump.close()
+            self._dump = None
         
     def get_bytecount(self):
-        return 0
+        return self._dump.data_size if self._dump is not None else 0
     
     def issue_token(self):
-        return ''
+        return self._dump.token if self._dump is not None else ''
     
     def set_token(self, token):
         pass
     
-    def transfer(self, progressObj = None):
-        return pickle.load(self._file)
+    def transfer(self, progressObj = None, **kwargs):
+        return [str(dive) for dive in self.iter_dives(progressObj)]
+    
+    def iter_dives(self, progressObj = None, **kwargs):
+        '''
+        Iterate over the dives in the dump file
+        
+        Each dive is read from the memory-mapped file by its offset when it
+        is reached, so only the dives which are used are read from disk.
+        '''
+        progress = ProgressReporter.wrap(progressObj)
+        progress.start(self._dump.data_size)
+        
+        pos = 0
+        for dive in self._dump:
+            pos += len(dive)
+            progress.update(pos)
+            yield dive
         
+        progress.finish()
+    
     @property
     def model(self):
+        if self._dump is not None and self._dump.model:
+            return self._dump.model
         return 'File'
     
     @property
@@ -70,12 +93,16 @@ class FileDriver(BaseDriver):
         '''
         Get the suggested parser class name
         '''
+        if self._dump is not None and self._dump.parser:
+            return self._dump.parser
         return None
     
     @property
     def serial(self):
+        if self._dump is not None and self._dump.serial:
+            return self._dump.serial
         return '0'
     
     @property
     def curtime(self):
-        return datetime.datetime.now()
\ No newline at end of file
+        return datetime.datetime.now()
@@ -31,15 +31,40 @@ protocol may be used; however, automatic model identification may not succeed.
 '''
 
 import datetime
+import logging
 import struct
 
 from divelog.dc import BaseDriver
+from divelog.dc.dump import DumpFile
+from divelog.dc.progress import ProgressReporter
+from divelog.dc.splitter import SmartDiveSplitter
 
 try:
     import irsocket
 except ImportError:
     irsocket = None
 
+log = logging.getLogger(__name__)
+
+def salvage_dives(data):
+    '''
+    Recover the complete dives from a partial transfer
+    
+    Splits data received from an interrupted Smart transfer (or read back from
+    a transfer spool file) into dives, ignoring a partial dive at the end.
+    Returns a tuple (dives, ticks) where ticks is the timestamp of the last 
+    complete dive, which may be used as the token for the next transfer so
+    that only the missing dives are downloaded, or None if no dive was 
+    complete.
+    '''
+    splitter = SmartDiveSplitter()
+    dives = splitter.feed(data)
+    
+    ticks = None
+    if dives:
+        ticks = max(struct.unpack_from('<L', d, 8)[0] for d in dives)
+    return (dives, ticks)
+
 class SmartDriver(BaseDriver):
     # Magic Attributes for the register_driver method
     NAME = 'smart'
@@ -51,31 +76,39 @@ class SmartDriver(BaseDriver):
             return False
         return True
     
-    # Transfer Chunk Size
+    # Transfer Chunk Size.  The chunk size starts at CHUNK_SIZE (or the
+    # chunk_size constructor argument) and adapts to the link during the
+    # transfer, up to MAX_CHUNK_SIZE.
     CHUNK_SIZE = 16
+    MAX_CHUNK_SIZE = 4096
     
     # List of Uwatec Smart Models and suggested parsers
     MODELS = [
-        { 'name': 'Smart Pro',      'id': 0x10, 'parser': None },
+        { 'name': 'Smart Pro',      'id': 0x10, 'parser': 'SmartPro' },
         { 'name': 'Galileo Sol',    'id': 0x11, 'parser': None },
-        { 'name': 'Aladin Tec',     'id': 0x12, 'parser': None },
+        { 'name': 'Aladin Tec',     'id': 0x12, 'parser': 'AladinTec' },
         { 'name': 'Aladin Tec 2G',  'id': 0x13, 'parser': 'AladinTec2G' },
-        { 'name': 'Smart Com',      'id': 0x14, 'parser': None },
-        { 'name': 'Smart Tec',      'id': 0x18, 'parser': None },
-        { 'name': 'Smart Z',        'id': 0x1c, 'parser': None },
+        { 'name': 'Smart Com',      'id': 0x14, 'parser': 'SmartCom' },
+        { 'name': 'Smart Tec',      'id': 0x18, 'parser': 'SmartTec' },
+        { 'name': 'Smart Z',        'id': 0x1c, 'parser': 'SmartZ' },
     ]
     
     # Class Constructor
-    def __init__(self, **kwargs):
+    def __init__(self, chunk_size=None, **kwargs):
         '''
         Class Constructor
         
         Create a new instance of the Smart Driver.  Creates a new IrDA socket
         and initializes class members to None.  Note that if irsocket is not
-        installed, the constructor will throw an exception.
+        installed, the constructor will throw an exception.  The chunk_size
+        argument sets the initial number of bytes requested from the socket
+        at once during a transfer (default is CHUNK_SIZE), and is limited to
+        MAX_CHUNK_SIZE.
         '''
         super(SmartDriver, self).__init__(**kwargs)
         
+        self._chunk_size = min(max(int(chunk_size or self.CHUNK_SIZE), 1), self.MAX_CHUNK_SIZE)
+        
         # Create the IrDA Socket
         if irsocket is None:
             raise RuntimeError('Cannot initialize %s: irsocket is not installed', self.__class__.name)
@@ -87,6 +120,7 @@ class SmartDriver(BaseDriver):
         self._serial = None
         self._ticks = None
         self._token = None
+        self._resume_ticks = None
         
     def _sendcmd(self, command, recvlen):
         self._socket.sendall(command)
@@ -186,8 +220,12 @@ class SmartDriver(BaseDriver):
         only download new dives.
         
         The token returned from this function should be saved, and then passed
-        to set_token() prior to downloading new dives.
+        to set_token() prior to downloading new dives.  After a transfer which
+        was interrupted and salvaged, the token marks the last complete dive
+        received, so that the next transfer resumes after it.
         '''
+        if self._resume_ticks is not None:
+            return "%d" % self._resume_ticks
         return "%d" % self._ticks
     
     # Set the Token
@@ -202,7 +240,7 @@ class SmartDriver(BaseDriver):
         self._token = long(token or 0)
         
     # Transfer Dive Data
-    def transfer(self, progressObj = None):
+    def transfer(self, progressObj = None, spool = None, salvage = False):
         '''
         Transfer Dive Data
         
@@ -210,12 +248,48 @@ class SmartDriver(BaseDriver):
         all dives logged past the currently-set token and return a list of
         binary dive data.  Each entry in the list represents a single dive as
         logged by the computer, and can be decoded using the appropriate parser
-        object.
+        object.  The arguments are described in iter_dives().
+        '''
+        return list(self.iter_dives(progressObj, spool, salvage))
+    
+    # Iterate over Dives as they are Transferred
+    def iter_dives(self, progressObj = None, spool = None, salvage = False):
+        '''
+        Transfer Dive Data incrementally
+        
+        Generator version of transfer() which yields the binary data of each
+        dive as soon as all of its bytes have been received, so that a dive 
+        can be parsed and stored while later dives are still downloading.
+        Only the current receive chunk and the incomplete dive are held by 
+        the driver.
+        
+        If progressObj has a received() method, it is called with each chunk
+        of data as it arrives.  The update() method is called with the number
+        of bytes received so far, at most 30 times per second (see 
+        divelog.dc.progress); progressObj may also be a ProgressReporter to 
+        change the rate.
+        
+        The data is received directly into a chunk buffer using recv_into() if
+        the socket supports it.  The number of bytes requested at once doubles
+        while the socket returns full chunks and halves (down to the initial 
+        chunk size) when it returns short ones.
+        
+        If spool is a filename or a file object, the received data is also
+        written to it as it arrives, so that it survives a crash or a lost
+        connection (see salvage_dives()).  If salvage is True, a connection
+        error during the transfer does not raise an exception; instead the
+        transfer ends after the dives which were received completely, and
+        issue_token() returns the timestamp of the last of them.  The complete
+        property is False after a salvaged transfer, and after one which 
+        raised an exception (or was closed) before all of the data arrived, 
+        in which case issue_token() also returns the timestamp of the last
+        dive yielded.
         '''
+        self._resume_ticks = None
         num = self.get_bytecount()
         
         if num == 0:
-            return []
+            return
         
         cmd = '\xc4%s\x10\x27\x00\x00' % struct.pack('<L', self._token or 0)
         nb = struct.unpack('<L', self._sendcmd(cmd, 4))[0]
@@ -223,52 +297,110 @@ class SmartDriver(BaseDriver):
         if nb != num + 4:
             raise RuntimeError('Mismatch in returned byte counts in %s.transfer()' % self.__class__.name)
         
-        if hasattr(progressObj, 'start') and callable(progressObj.start):
-            progressObj.start(num)
+        progress = ProgressReporter.wrap(progressObj)
+        progress.start(num)
         
-        data = ''
-        while num > 0:
-            if num > self.CHUNK_SIZE:
-                s = self._socket.recv(self.CHUNK_SIZE)
-            else:
-                s = self._socket.recv(num)
-            
-            num -= len(s)
-            data += s
-            
-            if hasattr(progressObj, 'update') and callable(progressObj.update):
-                progressObj.update(len(data))
-            
-        if hasattr(progressObj, 'finish') and callable(progressObj.finish):
-            progressObj.finish()
-        
-        # Split data into dives.  This implementation intentionally does not
-        # use the str.split() method in case there is a A5A5 5A5A DWORD buried
-        # in the profile or in other legitimate data (e.g. a timestamp).  This
-        # could occur sometime in 2024.  We are future-proof!
-        _hdr = '\xa5\xa5\x5a\x5a'
-        _pos = 0
-        _len = 0
-        dives = []
-        
-        while _pos < len(data) - 4:
-            if data[_pos:_pos+4] != _hdr:
-                raise RuntimeError('Invalid or corrupt dive data in %s.transfer()' % self.__class__.name)
-            _len = struct.unpack_from('<L', data, _pos+4)[0]
+        spool_file = open(spool, 'wb') if isinstance(spool, basestring) else spool
+        
+        splitter = SmartDiveSplitter()
+        ndives = 0
+        ticks = None
+        
+        buf = bytearray(min(num, self.MAX_CHUNK_SIZE))
+        view = memoryview(buf)
+        recv_into = getattr(self._socket, 'recv_into', None)
+        chunk = self._chunk_size
+        pos = 0
+        try:
+            while pos < num:
+                n = min(chunk, num - pos)
+                try:
+                    if recv_into is not None:
+                        nr = recv_into(view[:n], n)
+                    else:
+                        s = self._socket.recv(n)
+                        nr = len(s)
+                        view[:nr] = s
+                    
+                    if nr == 0:
+                        raise IOError('Connection closed after %d of %d bytes in %s.transfer()' % (pos, num, self.__class__.__name__))
+                
+                except EnvironmentError, e:
+                    if not salvage:
+                        raise
+                    log.warning('Transfer interrupted after %d of %d bytes: %s' % (pos, num, e))
+                    break
+                
+                # Adapt the chunk size to the amount of data the link delivers
+                if nr == chunk:
+                    chunk = min(chunk * 2, self.MAX_CHUNK_SIZE)
+                elif nr < n:
+                    chunk = max(chunk // 2, self._chunk_size)
+                
+                s = view[:nr].tobytes()
+                if spool_file is not None:
+                    spool_file.write(s)
+                
+                progress.received(s)
+                pos += nr
+                progress.update(pos)
+                
+                for dive in splitter.feed(s):
+                    t = struct.unpack_from('<L', dive, 8)[0]
+                    if ticks is None or t > ticks:
+                        ticks = t
+                    ndives += 1
+                    yield dive
+        
+        finally:
+            if spool_file is not None and spool_file is not spool:
+                spool_file.close()
+            elif spool_file is not None:
+                spool_file.flush()
             
-            if _len <= 0:
-                raise RuntimeError('Length of dive %d is zero or negative in %s.transfer()' % (len(dives)+1, self.__class__.name))
-            if _pos + _len > len(data):
-                raise RuntimeError('Length of dive %d extends past received data in %s.transfer()' % (len(dives)+1, self.__class__.name))
-            dives.append(data[_pos:_pos+_len])
-            _pos += _len
-        
-        # Return list of dive data
-        return dives
+            # Resume after the last complete dive if the transfer stopped 
+            # early, whether it was salvaged or raised an exception
+            if pos < num:
+                self._resume_ticks = ticks if ticks is not None else (self._token or 0)
+        
+        progress.finish()
+        
+        if pos < num:
+            log.warning('Salvaged %d complete dives from an interrupted transfer' % ndives)
+        else:
+            splitter.close()
+    
+    def save_spool(self, spool, filename):
+        '''
+        Save the dives in a transfer spool file to a dive dump file
+        
+        Writes the complete dives received into spool (see iter_dives()) to 
+        the dump file 'filename' with this dive computer's model, serial and
+        parser, so that they can be imported later with the file driver.  The
+        token of the dump file is the timestamp of the last complete dive.
+        Returns the number of dives saved.
+        '''
+        with open(spool, 'rb') as f:
+            (dives, ticks) = salvage_dives(f.read())
+        
+        with DumpFile(filename, 'w', model=self.model, serial=self.serial, 
+                      parser=self.parser or '') as dump:
+            dump.extend(dives)
+            if ticks is not None:
+                dump.token = "%d" % ticks
+        
+        return len(dives)
     
     #-------------------------------------------------------------------------
     # Properties
     
+    @property
+    def complete(self):
+        '''
+        Check whether the last transfer received all of its data
+        '''
+        return self._resume_ticks is None
+    
     @property
     def curtime(self):
         '''
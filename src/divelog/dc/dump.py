@@ -0,0 +1,255 @@
+# =============================================================================
+# 
+# Copyright (C) 2011 Asymworks, LLC.  All Rights Reserved.
+# www.pydivelog.com / info@pydivelog.com
+# 
+# This file is part of the Python divecomputer Package (python-divecomputer)
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# 
+# =============================================================================
+
+'''
+Indexed dive dump container
+
+Stores raw dive data in a single binary file which can be opened without
+reading it, read in any order, and appended to.  The file layout is (all 
+integers are little-endian):
+    
+    Header (128 bytes)
+        magic       8s      'DIVEDUMP'
+        version     H       Format version (1)
+        reserved    H
+        model       48s     Dive computer model name
+        serial      16s     Dive computer serial number
+        token       16s     Transfer token after the last dive
+        parser      32s     Name of the parser for the dives
+        reserved    L
+    Dive data
+        The raw data of each dive, one after the other
+    Index (12 bytes per dive)
+        offset      Q       File offset of the dive data
+        length      L       Length of the dive data
+    Footer (24 bytes)
+        index       Q       File offset of the index
+        count       L       Number of dives
+        reserved    L
+        magic       8s      'DIVEINDX'
+
+Text fields are NUL-padded.  Readers memory-map the file and read the index 
+entries on demand, so a dump of any size opens immediately.  
+
+New dives are appended after the footer of the last complete index, which is
+left in place, and a new index and footer are written when the file is 
+closed, followed by the header.  If the file was not closed (e.g. after a 
+crash), the footer at the end of the file is missing and readers fall back
+to the last complete footer, so the dives appended since are lost but the 
+rest of the file remains readable.
+'''
+
+import logging
+import mmap
+import os
+import struct
+
+MAGIC = 'DIVEDUMP'
+INDEX_MAGIC = 'DIVEINDX'
+VERSION = 1
+
+_header = struct.Struct('<8sHH48s16s16s32sL')
+_entry = struct.Struct('<QL')
+_footer = struct.Struct('<QLL8s')
+
+log = logging.getLogger(__name__)
+
+class DumpFile(object):
+    '''
+    Indexed dive dump file
+    
+    Opens the dump file 'filename' for reading (mode 'r'), appending (mode 
+    'a', which creates the file if it does not exist) or writing a new file
+    (mode 'w').  The model, serial, token and parser header fields are 
+    attributes of the object, and may be changed in the append and write 
+    modes.  The object is a sequence of dives; each dive is returned as a 
+    read-only buffer into the memory-mapped file (or a string in the append
+    and write modes), which can be passed directly to a parser.
+    
+    The file must be closed with close() (or by using the object as a 
+    context manager) to write the index of appended dives.
+    '''
+    def __init__(self, filename, mode='r', **kwargs):
+        if mode not in ('r', 'a', 'w'):
+            raise ValueError("Invalid mode '%s'" % mode)
+        
+        self.filename = filename
+        self.mode = mode
+        self.model = ''
+        self.serial = ''
+        self.token = ''
+        self.parser = ''
+        
+        self._mm = None
+        self._index = None
+        self._count = 0
+        self._entries = None
+        self._data_size = 0
+        
+        if mode == 'w' or (mode == 'a' and not os.path.exists(filename)):
+            self._file = open(filename, 'w+b')
+            self._entries = []
+            self._end = _header.size
+            self._write_header()
+        
+        else:
+            self._file = open(filename, 'rb' if mode == 'r' else 'r+b')
+            self._read_header()
+            if mode == 'a':
+                self._entries = [self._entry(i) for i in xrange(self._count)]
+                self._end = self._index + self._count * _entry.size + _footer.size
+                self._mm.close()
+                self._mm = None
+        
+        for (key, value) in kwargs.iteritems():
+            if key not in ('model', 'serial', 'token', 'parser'):
+                raise TypeError("Unknown header field '%s'" % key)
+            setattr(self, key, value)
+    
+    def _read_header(self):
+        '''Map the file and read the header and footer'''
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _header.size + _footer.size:
+            raise IOError("'%s' is not a dive dump file" % self.filename)
+        
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        fields = _header.unpack_from(self._mm, 0)
+        if fields[0] != MAGIC:
+            raise IOError("'%s' is not a dive dump file" % self.filename)
+        if fields[1] > VERSION:
+            raise IOError("'%s' has unsupported version %d" % (self.filename, fields[1]))
+        
+        (self.model, self.serial, self.token, self.parser) = [f.rstrip('\0') for f in fields[3:7]]
+        
+        (self._index, self._count, _, magic) = _footer.unpack_from(self._mm, size - _footer.size)
+        if magic != INDEX_MAGIC or self._index + self._count * _entry.size + _footer.size != size:
+            self._find_footer(size)
+        
+        self._data_size = sum(self._entry(i)[1] for i in xrange(self._count))
+    
+    def _find_footer(self, size):
+        '''
+        Find the last complete footer in a file which was not closed
+        
+        Searches backwards from the end of the file for the footer magic, and
+        uses the last footer which matches the position of its index.
+        '''
+        end = size
+        while True:
+            pos = self._mm.rfind(INDEX_MAGIC, _header.size, end)
+            if pos < 0:
+                raise IOError("'%s' has a missing or corrupt index" % self.filename)
+            
+            start = pos + len(INDEX_MAGIC) - _footer.size
+            if start >= _header.size:
+                (index, count, _, _) = _footer.unpack_from(self._mm, start)
+                if index >= _header.size and index + count * _entry.size == start:
+                    break
+            end = pos + len(INDEX_MAGIC) - 1
+        
+        log.warning("'%s' was not closed, ignoring %d bytes after the last index" % (self.filename, size - start - _footer.size))
+        (self._index, self._count) = (index, count)
+    
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(_header.pack(MAGIC, VERSION, 0, str(self.model), 
+            str(self.serial), str(self.token), str(self.parser), 0))
+    
+    def _entry(self, i):
+        '''Return the (offset, length) index entry of dive i'''
+        return _entry.unpack_from(self._mm, self._index + i * _entry.size)
+    
+    @property
+    def data_size(self):
+        '''Total size of the dive data [bytes]'''
+        return self._data_size
+    
+    def __len__(self):
+        if self._entries is not None:
+            return len(self._entries)
+        return self._count
+    
+    def __getitem__(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if i < 0 or i >= n:
+            raise IndexError('Dive index out of range')
+        
+        if self._mm is not None:
+            (offset, length) = self._entry(i)
+            return buffer(self._mm, offset, length)
+        
+        (offset, length) = self._entries[i]
+        self._file.seek(offset)
+        return self._file.read(length)
+    
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+    
+    def append(self, data):
+        '''Append a dive to the file'''
+        if self.mode == 'r':
+            raise IOError('Dump file is open for reading')
+        
+        self._file.seek(self._end)
+        self._file.write(data)
+        self._entries.append((self._end, len(data)))
+        self._end += len(data)
+        self._data_size += len(data)
+    
+    def extend(self, dives):
+        '''Append a sequence of dives to the file'''
+        for data in dives:
+            self.append(data)
+    
+    def close(self):
+        '''Write the header and index, and close the file'''
+        if self._file is None:
+            return
+        
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        
+        # Write the header last, so that the token is never updated without
+        # the index of the dives which it follows
+        if self.mode != 'r':
+            self._file.seek(self._end)
+            self._file.write(''.join(_entry.pack(*e) for e in self._entries))
+            self._file.write(_footer.pack(self._end, len(self._entries), 0, INDEX_MAGIC))
+            self._file.truncate()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._write_header()
+        
+        self._file.close()
+        self._file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
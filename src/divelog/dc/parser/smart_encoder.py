@@ -0,0 +1,211 @@
+# =============================================================================
+# 
+# Copyright (C) 2011 Asymworks, LLC.  All Rights Reserved.
+# www.pydivelog.com / info@pydivelog.com
+# 
+# This file is part of the Python divecomputer Package (python-divecomputer)
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# 
+# =============================================================================
+
+'''
+Synthetic Uwatec Smart dive encoder
+
+Encodes profile series into raw Smart dives for tests and benchmarks (see 
+divelog/dc/bin/bench_smart.py).  This is development tooling and is not used
+when transferring or parsing dives.
+'''
+
+import datetime
+import struct
+
+from divelog.dc.splitter import SmartDiveSplitter
+
+class SmartEncoder(object):
+    '''
+    Synthetic Smart dive encoder
+    
+    Inverse of the Smart parsers: encodes depth, temperature and alarm series
+    into a raw dive using the DTI table, alarm indices and header layout of a
+    parser class, so that parsing the result with the same class returns the
+    original series.  This is used to generate test and benchmark dives 
+    without a dive computer.
+    
+    Samples are taken every 4 seconds.  Depths are in cm and temperatures in
+    0.1 deg C, and are rounded to the resolution of the format (2 cm and 
+    0.4 deg C).  Alarms are bitmasks as stored in the profile samples (alarm
+    index n, mask m is bit m << 8n).  Each value is written with the smallest
+    DTI which can hold it, and samples with an unchanged state are written as
+    time DTIs.
+    '''
+    def __init__(self, parser_cls):
+        self.parser_cls = parser_cls
+        self._dtis = {}
+        self._sizes = []
+        
+        decoder = parser_cls.dti_decoder()
+        for (idx, dti) in enumerate(parser_cls.DTI_TABLE):
+            (nhdr, mask, nextra, sgnbit) = decoder._entries[idx]
+            nbits = 8 * nextra
+            if mask:
+                nbits += 8 - dti['bits'] % 8
+            
+            self._sizes.append((nbits, nhdr + nextra))
+            key = (dti['name'], dti['abs'], dti['idx'])
+            self._dtis.setdefault(key, []).append((nbits, idx, nhdr + nextra))
+        
+        for entries in self._dtis.values():
+            entries.sort()
+    
+    def encode_dti(self, idx, value):
+        '''Encode a single DTI from the DTI table with the given value'''
+        if not 0 <= idx < len(self._sizes):
+            raise ValueError('Invalid DTI index (%d)' % idx)
+        
+        (nbits, nbytes) = self._sizes[idx]
+        word = ((1 << idx) - 1) << (8 * nbytes - idx)
+        word |= value & ((1 << nbits) - 1)
+        return ''.join(chr((word >> (8 * k)) & 0xFF) for k in reversed(xrange(nbytes)))
+    
+    def _encode(self, out, name, absolute, value, idx=0):
+        '''Append the smallest DTI of a kind which can hold the value'''
+        for (nbits, i, nbytes) in self._dtis.get((name, absolute, idx), []):
+            if absolute:
+                fits = 0 <= value < (1 << nbits)
+            else:
+                fits = -(1 << (nbits - 1)) <= value < (1 << (nbits - 1))
+            if fits:
+                out.append(self.encode_dti(i, value))
+                return True
+        
+        return False
+    
+    def encode_profile(self, depth, temp, alarms=None, surface=0):
+        '''
+        Encode the profile samples into a DTI stream
+        
+        The Smart format reports depths relative to the first absolute depth
+        (the surface depth, given in cm by the surface argument), so the first
+        depth sample must be 0.
+        '''
+        n = len(depth)
+        if n == 0:
+            return ''
+        if len(temp) != n or (alarms is not None and len(alarms) != n):
+            raise ValueError('Profile series must have the same length')
+        if depth[0] != 0:
+            raise ValueError('The first depth sample must be 0')
+        if alarms is None:
+            alarms = [0] * n
+        
+        out = []
+        cal = int(round(surface / 2.0))
+        
+        # Initial Temperature and Alarms, then the first (absolute) Depth
+        cur_t = int(round(temp[0] / 4.0))
+        self._encode(out, 'temp', True, cur_t)
+        cur_a = 0
+        self._encode_alarms(out, cur_a, alarms[0])
+        cur_a = alarms[0]
+        cur_d = cal
+        if not self._encode(out, 'depth', True, cur_d):
+            raise ValueError('Surface depth %d cm cannot be encoded' % surface)
+        
+        pending = 0
+        for i in xrange(1, n):
+            d = cal + int(round(depth[i] / 2.0))
+            t = int(round(temp[i] / 4.0))
+            a = alarms[i]
+            if d == cur_d and t == cur_t and a == cur_a:
+                pending += 1
+                continue
+            
+            self._encode_time(out, pending)
+            pending = 0
+            
+            if t != cur_t:
+                if not self._encode(out, 'temp', False, t - cur_t):
+                    self._encode(out, 'temp', True, t)
+                cur_t = t
+            
+            if a != cur_a:
+                self._encode_alarms(out, cur_a, a)
+                cur_a = a
+            
+            # Each depth DTI emits one sample.  An absolute depth would set the
+            # calibration depth if it has not been set by the surface depth.
+            if not self._encode(out, 'depth', False, d - cur_d):
+                if cal == 0 or not self._encode(out, 'depth', True, d):
+                    raise ValueError('Depth change at sample %d cannot be encoded' % i)
+            cur_d = d
+        
+        self._encode_time(out, pending)
+        return ''.join(out)
+    
+    def _encode_alarms(self, out, old, new):
+        '''Append alarm DTIs for each alarm index which changed'''
+        idx = 0
+        while (old | new) >> (8 * idx):
+            value = (new >> (8 * idx)) & 0xFF
+            if value != (old >> (8 * idx)) & 0xFF:
+                if not self._encode(out, 'alarms', True, value, idx):
+                    raise ValueError('Alarm %d value %d cannot be encoded' % (idx, value))
+            idx += 1
+    
+    def _encode_time(self, out, count):
+        '''Append time DTIs which repeat the current state count times'''
+        nbits = self._dtis[('time', True, 0)][-1][0]
+        nmax = (1 << nbits) - 1
+        while count > 0:
+            self._encode(out, 'time', True, min(count, nmax))
+            count -= nmax
+    
+    def encode_dive(self, depth, temp, alarms=None, header=None, surface=0):
+        '''
+        Encode a complete raw dive
+        
+        Returns the dive header, including the dive marker and length, followed
+        by the encoded profile.  The header argument is a dictionary of header
+        fields as returned by the parser; the date, duration and depth and
+        temperature summary fields default to values computed from the 
+        profile.
+        
+        Values which do not fit in their header field (e.g. a temperature 
+        below 0 deg C in an unsigned field) raise a ValueError.
+        '''
+        fields = {
+            'date':         datetime.datetime(2011, 1, 1),
+            'duration':     (len(depth) * 4 + 59) / 60,
+            'max_depth':    max(depth) if depth else 0,
+            'avg_depth':    sum(depth) / len(depth) if depth else 0,
+            'max_temp':     max(temp) if temp else 0,
+            'min_temp':     min(temp) if temp else 0,
+            'air_temp':     temp[0] if temp else 0,
+        }
+        fields.update(header or {})
+        
+        layout = self.parser_cls.header_layout()
+        for field in layout.datetime_fields:
+            td = fields[field] - datetime.datetime(2000, 1, 1)
+            fields[field] = (td.days * 86400 + td.seconds) * 2
+        
+        profile = self.encode_profile(depth, temp, alarms, surface)
+        
+        hdr = bytearray(layout.pack(fields))
+        hdr[0:4] = SmartDiveSplitter.HEADER
+        struct.pack_into('<L', hdr, 4, len(hdr) + len(profile))
+        
+        return str(hdr) + profile
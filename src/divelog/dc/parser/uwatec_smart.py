@@ -30,107 +30,1060 @@ Smart Z.  Each device uses a slightly different header and profile format, so
 the client should choose the proper device based on the dive computer model.
 '''
 
-import base64
+import copy
 import datetime
 import logging
 import struct
+import time
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 log = logging.getLogger(__name__)
 
-from divelog.dc import BaseParser, BaseAdapter
+from divelog.dc import BaseParser, BaseAdapter, list_parsers
 from divelog.dc.parser import ParseError
 
+# Number of leading '1' bits in each possible byte value
+_LEADING_ONES = []
+for _b in range(256):
+    _n = 0
+    while _n < 8 and _b & (0x80 >> _n):
+        _n += 1
+    _LEADING_ONES.append(_n)
+del _b, _n
+
+def byte_view(data):
+    '''
+    Return a zero-copy view of raw dive data which can be indexed by offset
+    
+    The parsers read single bytes with ord(data[i]), which works directly on
+    str, buffer, memoryview and mmap objects.  Indexing a bytearray returns
+    an integer, so it is wrapped in a memoryview instead of copied.
+    '''
+    if isinstance(data, bytearray):
+        return memoryview(data)
+    return data
+
+class DTIDecoder(object):
+    '''
+    Compiled Data Type Identifier decoder
+    
+    Pre-computes the bit layout of each entry in a parser's DTI table so that
+    samples can be decoded without walking the type bits one at a time.  The
+    DTI index is the number of leading '1' bits in the sample, which is read a
+    whole byte at a time from a 256-entry lookup table.  DTIs which fit in a
+    single byte are fully pre-decoded, so the most common samples (e.g. delta
+    depth) cost a single table lookup.
+    
+    The decoder should be built once per parser class; see the dti_decoder()
+    class method of BaseSmartParser.
+    '''
+    def __init__(self, dti_table):
+        self.dti_table = dti_table
+        self._entries = []
+        
+        for dti in dti_table:
+            nskip = dti['bits'] / 8
+            n = dti['bits'] % 8
+            partial = 0
+            mask = 0
+            nbits = 8 * dti['extra']
+            if n > 0:
+                partial = 1
+                if not dti['ignore_type_bits']:
+                    mask = 0xFF >> n
+                    nbits += 8 - n
+            
+            sgnbit = (1 << (nbits - 1)) if 0 < nbits <= 32 else 0
+            self._entries.append((nskip + partial, mask, dti['extra'], sgnbit))
+        
+        self.sign_bits = [e[3] for e in self._entries]
+        self.sizes = [e[0] + e[2] for e in self._entries]
+        
+        # Pre-decode all DTIs which fit in a single byte
+        self._single = [None] * 256
+        for b in range(256):
+            idx = _LEADING_ONES[b]
+            if idx >= len(self._entries):
+                continue
+            (nhdr, mask, nextra, sgnbit) = self._entries[idx]
+            if nhdr == 1 and nextra == 0:
+                value = b & mask
+                svalue = value - (sgnbit << 1) if value & sgnbit else value
+                self._single[b] = (idx, value, svalue)
+    
+    def decode(self, data, offset, end=None):
+        '''
+        Decode the DTI at offset
+        
+        Returns a tuple (offset, idx, value, svalue) where offset points to the
+        next DTI, idx is the index into the DTI table, and value and svalue are
+        the unsigned and signed data values.
+        '''
+        if end is None:
+            end = len(data)
+        
+        # Identify the DTI
+        idx = 0
+        pos = offset
+        while True:
+            if pos >= end:
+                raise ParseError('Unexpected end of data')
+            n = _LEADING_ONES[ord(data[pos])]
+            idx += n
+            if n < 8:
+                break
+            pos += 1
+        
+        if idx >= len(self._entries):
+            raise ParseError('Invalid DTI index (%d)' % idx)
+        
+        (nhdr, mask, nextra, sgnbit) = self._entries[idx]
+        
+        # Ensure that we have enough bytes remaining
+        pos = offset + nhdr
+        if pos + nextra > end:
+            raise ParseError('Unexpected end of data')
+        
+        # Read the data bits from the type byte and any extra bytes
+        value = 0
+        if mask:
+            value = ord(data[pos - 1]) & mask
+        for i in xrange(pos, pos + nextra):
+            value = (value << 8) | ord(data[i])
+        
+        # Fix the Sign Bit
+        if value & sgnbit:
+            svalue = value - (sgnbit << 1)
+        else:
+            svalue = value
+        
+        return (pos + nextra, idx, value, svalue)
+    
+    def iterdecode(self, data, offset=0, end=None):
+        '''
+        Decode all DTIs between offset and end
+        
+        Yields a tuple (idx, value, svalue) for each DTI in the data.
+        '''
+        if end is None:
+            end = len(data)
+        
+        single = self._single
+        decode = self.decode
+        pos = offset
+        while pos < end:
+            dti = single[ord(data[pos])]
+            if dti is not None:
+                pos += 1
+                yield dti
+            else:
+                (pos, idx, value, svalue) = decode(data, pos, end)
+                yield (idx, value, svalue)
+    
+    def compile_runs(self, summary=False, counts=False):
+        '''
+        Generate a specialized profile decoding function
+        
+        Generates and compiles the source of a function which decodes a whole
+        profile with one branch per DTI index, with the bit layout and scale 
+        of each DTI inlined as constants, so that no DTI table lookups or name
+        comparisons are made per sample.  The function is called as
+            
+            fn(data, offset, end, state, append_run)
+        
+        where state holds the profile state (see BaseSmartParser.init_parser)
+        and append_run is called as in BaseSmartParser.decode_runs().  The 
+        position at which decoding stopped, including the start of a DTI
+        which raised a ParseError, is stored in state.pos.  If 
+        summary is True, the function takes a ProfileSummary object as a sixth
+        argument and the summary updates of ProfileSummary.append_run() are
+        inlined after each append_run() call.  If counts is True, the function
+        takes a list with one counter per DTI index as its last argument, and 
+        increments the counter of each DTI which is decoded.  The generated 
+        source is kept in the 'source' attribute of the function.
+        '''
+        src = [
+            'def decode_runs(data, offset, end, state, append_run%s%s):' % (
+                ', summary' if summary else '', ', counts' if counts else ''),
+            '    time = state.time',
+            '    depth = state.depth',
+            '    temp = state.temp',
+            '    cal = state.cal',
+            '    alarms = state.alarms',
+            '    has_depth = state.has_depth',
+            '    has_temp = state.has_temp',
+        ]
+        
+        if summary:
+            src += [
+                '    depth_samples = summary.depth_samples',
+                '    depth_get = depth_samples.get',
+                '    last_depth = summary._last_depth',
+                '    max_ascent = summary.max_ascent',
+                '    max_descent = summary.max_descent',
+                '    min_temp = summary.min_temp if summary.min_temp is not None else 0x7fffffff',
+                '    max_temp = summary.max_temp if summary.max_temp is not None else -0x7fffffff',
+            ]
+        
+        src += [
+            '    pos = offset',
+            '    try:',
+            '        while pos < end:',
+            '            b = ord(data[pos])',
+            '            idx = LEADING_ONES[b]',
+        ]
+        
+        # Multi-byte identifiers are only possible with 8 or more DTIs
+        if len(self._entries) > 8:
+            src += [
+                '            if idx == 8:',
+                '                n = 8',
+                '                p = pos',
+                '                while n == 8:',
+                '                    p += 1',
+                '                    if p >= end:',
+                '                        raise ParseError("Unexpected end of data")',
+                '                    n = LEADING_ONES[ord(data[p])]',
+                '                    idx += n',
+            ]
+        
+        for (idx, dti) in enumerate(self.dti_table):
+            (nhdr, mask, nextra, sgnbit) = self._entries[idx]
+            size = nhdr + nextra
+            src.append('            %s idx == %d:    # %s %s' % ('if' if idx == 0 else 'elif', idx, 
+                'abs' if dti['abs'] else 'delta', dti['name']))
+            if size > 1:
+                src.append('                if pos + %d > end:' % size)
+                src.append('                    raise ParseError("Unexpected end of data")')
+            
+            # Read the data bits
+            terms = []
+            if mask:
+                byte = 'b' if nhdr == 1 else 'ord(data[pos + %d])' % (nhdr - 1)
+                terms.append('(%s & 0x%02x)' % (byte, mask))
+            for i in range(nextra):
+                terms = ['(%s << 8)' % ' | '.join(terms)] if terms else []
+                terms.append('ord(data[pos + %d])' % (nhdr + i))
+            src.append('                value = %s' % (' | '.join(terms) or '0'))
+            src.append('                pos += %d' % size)
+            if counts:
+                src.append('                counts[%d] += 1' % idx)
+            
+            # Update the state
+            count = None
+            if dti['name'] == 'temp' and dti['abs']:
+                src.append('                temp = value * 4')
+                src.append('                has_temp = True')
+            elif dti['name'] == 'temp':
+                src.append('                temp += (value - 0x%x if value & 0x%x else value) * 4' % (sgnbit << 1, sgnbit))
+            elif dti['name'] == 'depth' and dti['abs']:
+                src.append('                depth = value * 2')
+                src.append('                if cal == 0:')
+                src.append('                    cal = depth')
+                src.append('                has_depth = True')
+                count = '1'
+            elif dti['name'] == 'depth':
+                src.append('                depth += (value - 0x%x if value & 0x%x else value) * 2' % (sgnbit << 1, sgnbit))
+                count = '1'
+            elif dti['name'] == 'pressure_depth':
+                src.append('                depth += (((value & 0xff) ^ 0x80) - 0x80) * 2')
+                count = '1'
+            elif dti['name'] == 'alarms':
+                src.append('                alarms = (alarms & ~0x%x) | (value << %d)' % (0xFF << (8 * dti['idx']), 8 * dti['idx']))
+            elif dti['name'] == 'time':
+                count = 'value'
+            elif dti['name'] in ('pressure', 'rbt', 'unknown'):
+                pass
+            else:
+                src.append('                log.warning("Unrecognized DTI: %s")' % dti['name'])
+            
+            # Emit the samples
+            if count == '1':
+                src.append('                append_run(time, 1, depth - cal, temp, alarms, has_depth, has_temp)')
+                if summary:
+                    src += self._summary_source('                ', '1')
+                src.append('                time += 4')
+            elif count is not None:
+                src.append('                if value > 0:')
+                src.append('                    append_run(time, value, depth - cal, temp, alarms, has_depth, has_temp)')
+                if summary:
+                    src += self._summary_source('                    ', 'value')
+                src.append('                    time += 4 * value')
+        
+        src += [
+            '            else:',
+            '                raise ParseError("Invalid DTI index (%d)" % idx)',
+            '    finally:',
+            '        state.time = time',
+            '        state.depth = depth',
+            '        state.temp = temp',
+            '        state.cal = cal',
+            '        state.alarms = alarms',
+            '        state.has_depth = has_depth',
+            '        state.has_temp = has_temp',
+            '        state.complete = 0',
+            '        state.pos = pos',
+        ]
+        
+        if summary:
+            src += [
+                '        summary._last_depth = last_depth',
+                '        summary.max_ascent = max_ascent',
+                '        summary.max_descent = max_descent',
+                '        if min_temp <= max_temp:',
+                '            summary.min_temp = min_temp',
+                '            summary.max_temp = max_temp',
+            ]
+        
+        src.append('')
+        source = '\n'.join(src)
+        env = {'LEADING_ONES': _LEADING_ONES, 'ParseError': ParseError, 'log': log}
+        exec compile(source, '<smart decoder>', 'exec') in env
+        
+        fn = env['decode_runs']
+        fn.source = source
+        return fn
+    
+    def _summary_source(self, indent, count):
+        '''Return the source lines which add a run to the inlined summary'''
+        lines = [
+            'if has_depth:',
+            '    d = depth - cal',
+            '    if d != last_depth:',
+            '        if last_depth is not None:',
+            '            if d - last_depth > max_descent:',
+            '                max_descent = d - last_depth',
+            '            elif last_depth - d > max_ascent:',
+            '                max_ascent = last_depth - d',
+            '        last_depth = d',
+            '    depth_samples[d] = depth_get(d, 0) + %s' % count,
+            'if has_temp:',
+            '    if temp < min_temp:',
+            '        min_temp = temp',
+            '    if temp > max_temp:',
+            '        max_temp = temp',
+        ]
+        return [indent + line for line in lines]
+
+class HeaderLayout(object):
+    '''
+    Compiled dive header layout
+    
+    Compiles a declarative header layout into a single struct.Struct so that
+    all header fields are read with one unpack_from() call.  The layout is a
+    list of (field, offset, type, scale) tuples, where type is a struct format
+    character ('B', 'b', 'H', 'L', ...), optionally prefixed with a repeat
+    count (e.g. '8L') to read a list of values, or 'datetime' for a Smart
+    tick count.  If scale is not None, the value is multiplied by it.  Bytes
+    not covered by a field are skipped.
+    '''
+    # Integer struct format characters
+    INT_TYPES = 'bBhHiIlLqQ'
+    
+    def __init__(self, layout, size=None):
+        self.layout = layout
+        self.fields = []
+        self.ranges = []
+        self.datetime_fields = []
+        
+        fmt = '<'
+        end = 0
+        for (field, offset, type, scale) in sorted(layout, key=lambda f: f[1]):
+            if offset < end:
+                raise ValueError("Header field '%s' overlaps the previous field" % field)
+            if offset > end:
+                fmt += '%dx' % (offset - end)
+            
+            if type == 'datetime':
+                type = 'L'
+                self.datetime_fields.append(field)
+            
+            count = int(type[:-1] or 1)
+            self.fields.append((field, count if type[:-1] else None, scale))
+            
+            # Range of values which the field can hold
+            if type[-1] in self.INT_TYPES:
+                nbits = 8 * struct.calcsize('<' + type[-1])
+                if type[-1].islower():
+                    self.ranges.append((type[-1], -(1 << (nbits - 1)), (1 << (nbits - 1)) - 1))
+                else:
+                    self.ranges.append((type[-1], 0, (1 << nbits) - 1))
+            else:
+                self.ranges.append(None)
+            fmt += type
+            end = offset + struct.calcsize('<' + type)
+        
+        if size is not None and size > end:
+            fmt += '%dx' % (size - end)
+        
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+    
+    def unpack_from(self, data, offset=0):
+        '''Unpack the header fields into a dictionary'''
+        values = self.struct.unpack_from(data, offset)
+        header = {}
+        i = 0
+        for (field, count, scale) in self.fields:
+            if count is None:
+                value = values[i]
+                i += 1
+                if scale is not None:
+                    value *= scale
+            else:
+                value = list(values[i:i+count])
+                i += count
+                if scale is not None:
+                    value = [v * scale for v in value]
+            header[field] = value
+        
+        return header
+    
+    def pack(self, header):
+        '''
+        Pack a dictionary of header fields (inverse of unpack_from())
+        
+        Raises a ValueError if a value does not fit in its field.
+        '''
+        values = []
+        for ((field, count, scale), limits) in zip(self.fields, self.ranges):
+            if count is None:
+                items = [header.get(field, 0)]
+            else:
+                items = header.get(field, [0] * count)
+            
+            for value in items:
+                if scale is not None:
+                    value = int(round(value / scale))
+                if limits is not None and not limits[1] <= value <= limits[2]:
+                    raise ValueError("Header field '%s' value %d does not fit in format '%s'" % (field, value, limits[0]))
+                values.append(value)
+        
+        return self.struct.pack(*values)
+
+class AlarmDecoder(object):
+    '''
+    Alarm bitmask decoder
+    
+    Profile samples store the active alarms as a single integer bitmask in
+    which each alarm index occupies 8 bits, so that alarm index n with mask m
+    is the bit m << 8n.  The decoder translates a bitmask into a tuple of 
+    alarm names using the parser's ALARM_TABLE, and caches the result for 
+    each bitmask seen.  Alarms missing from the table are named 'alarmN_M'.
+    '''
+    def __init__(self, alarm_table=[]):
+        self._bits = {}
+        for a in alarm_table:
+            self._bits[a['mask'] << (8 * a['idx'])] = a['name']
+        self._cache = {0: ()}
+    
+    def names(self, mask):
+        '''Return the tuple of alarm names set in an alarm bitmask'''
+        try:
+            return self._cache[mask]
+        except KeyError:
+            pass
+        
+        names = []
+        bit = 0
+        while (1 << bit) <= mask:
+            m = 1 << bit
+            if mask & m:
+                names.append(self._bits.get(m, 'alarm%d_%d' % (bit / 8, 1 << (bit % 8))))
+            bit += 1
+        
+        self._cache[mask] = tuple(names)
+        return self._cache[mask]
+
+class ProfileColumns(object):
+    '''
+    Column-oriented Smart dive profile
+    
+    Stores the profile samples in four array('i') columns: time [s], depth
+    [cm], temperature [0.1 deg C] and an alarm bitmask, in which each alarm
+    index occupies 8 bits (alarm index n, mask m is bit m << 8n).  This uses a
+    few bytes per sample instead of a Python dictionary per sample.
+    
+    Depth and temperature are only valid once the first absolute value has
+    been seen, which is recorded in depth_start and temp_start (the index of
+    the first valid sample, or None).
+    
+    For compatibility with the list-of-dictionaries profile, the object is a
+    read-only sequence whose items are profile dictionaries created on demand.
+    The alarm_decoder argument is the AlarmDecoder used to name the alarms.
+    '''
+    def __init__(self, alarm_decoder=None):
+        self.time = array('i')
+        self.depth = array('i')
+        self.temp = array('i')
+        self.alarms = array('i')
+        
+        self.depth_start = None
+        self.temp_start = None
+        
+        self.alarm_decoder = alarm_decoder or AlarmDecoder()
+    
+    def append_run(self, time, count, depth, temp, alarms, has_depth=True, has_temp=True):
+        '''Append count samples taken every 4 seconds with the same values'''
+        n = len(self.time)
+        if has_depth and self.depth_start is None:
+            self.depth_start = n
+        if has_temp and self.temp_start is None:
+            self.temp_start = n
+        
+        if count == 1:
+            self.time.append(time)
+            self.depth.append(depth)
+            self.temp.append(temp)
+            self.alarms.append(alarms)
+        else:
+            self.time.extend(xrange(time, time + 4 * count, 4))
+            self.depth.extend(array('i', [depth]) * count)
+            self.temp.extend(array('i', [temp]) * count)
+            self.alarms.extend(array('i', [alarms]) * count)
+    
+    def alarm_names(self, mask):
+        '''Return the tuple of alarm names set in an alarm bitmask'''
+        return self.alarm_decoder.names(mask)
+    
+    def __len__(self):
+        return len(self.time)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(len(self.time)))]
+        
+        if i < 0:
+            i += len(self.time)
+        
+        entry = {'time': self.time[i]}
+        
+        if self.temp_start is not None and i >= self.temp_start:
+            entry['temp'] = self.temp[i]
+        
+        if self.depth_start is not None and i >= self.depth_start:
+            entry['depth'] = self.depth[i]
+        
+        if self.alarms[i]:
+            entry['alarms'] = self.alarms[i]
+        
+        return entry
+    
+    def __iter__(self):
+        for i in xrange(len(self.time)):
+            yield self[i]
+    
+    def to_list(self):
+        '''Return the profile as a list of profile dictionaries'''
+        n = len(self.time)
+        temp_start = n if self.temp_start is None else self.temp_start
+        depth_start = n if self.depth_start is None else self.depth_start
+        
+        profile = []
+        for (i, time, depth, temp, mask) in zip(xrange(n), self.time, self.depth, self.temp, self.alarms):
+            entry = {'time': time}
+            if i >= temp_start:
+                entry['temp'] = temp
+            if i >= depth_start:
+                entry['depth'] = depth
+            if mask:
+                entry['alarms'] = mask
+            profile.append(entry)
+        
+        return profile
+
+class ProfileRuns(object):
+    '''
+    Run-length encoded Smart dive profile
+    
+    Stores the profile as runs of consecutive samples which share the same
+    depth, temperature and alarms, so that memory scales with the number of
+    changes in the profile rather than with the dive length.  Each run is a 
+    start time [s] and a sample count (samples are 4 seconds apart), and the
+    depth [cm], temperature [0.1 deg C] and alarm bitmask of its samples; 
+    each is stored in an array('i') column.  Runs are produced directly from
+    the DTI stream, and adjacent runs with the same state are merged.
+    
+    As in ProfileColumns, depth_start and temp_start are the index of the 
+    first sample with a valid depth and temperature (or None).
+    
+    The segments() method iterates over the runs, while iterating over the
+    object itself expands the runs into one profile dictionary per sample.
+    '''
+    def __init__(self, alarm_decoder=None):
+        self.start = array('i')
+        self.count = array('i')
+        self.depth = array('i')
+        self.temp = array('i')
+        self.alarms = array('i')
+        
+        self.depth_start = None
+        self.temp_start = None
+        self.nsamples = 0
+        
+        self.alarm_decoder = alarm_decoder or AlarmDecoder()
+    
+    def append_run(self, time, count, depth, temp, alarms, has_depth=True, has_temp=True):
+        '''Append count samples taken every 4 seconds with the same values'''
+        n = len(self.count)
+        merge = n > 0 and depth == self.depth[-1] and temp == self.temp[-1] \
+            and alarms == self.alarms[-1] \
+            and time == self.start[-1] + 4 * self.count[-1] \
+            and (self.depth_start is not None or not has_depth) \
+            and (self.temp_start is not None or not has_temp)
+        
+        if has_depth and self.depth_start is None:
+            self.depth_start = self.nsamples
+        if has_temp and self.temp_start is None:
+            self.temp_start = self.nsamples
+        
+        if merge:
+            self.count[-1] += count
+        else:
+            self.start.append(time)
+            self.count.append(count)
+            self.depth.append(depth)
+            self.temp.append(temp)
+            self.alarms.append(alarms)
+        
+        self.nsamples += count
+    
+    def alarm_names(self, mask):
+        '''Return the tuple of alarm names set in an alarm bitmask'''
+        return self.alarm_decoder.names(mask)
+    
+    def segments(self):
+        '''
+        Iterate over the runs
+        
+        Yields a tuple (start, count, state) for each run, where state is a 
+        profile dictionary without the 'time' key.
+        '''
+        n = self.nsamples
+        temp_start = n if self.temp_start is None else self.temp_start
+        depth_start = n if self.depth_start is None else self.depth_start
+        
+        i = 0
+        for (start, count, depth, temp, mask) in zip(self.start, self.count, self.depth, self.temp, self.alarms):
+            state = {}
+            if i >= temp_start:
+                state['temp'] = temp
+            if i >= depth_start:
+                state['depth'] = depth
+            if mask:
+                state['alarms'] = mask
+            yield (start, count, state)
+            i += count
+    
+    def __len__(self):
+        return self.nsamples
+    
+    def __iter__(self):
+        for (start, count, state) in self.segments():
+            for time in xrange(start, start + 4 * count, 4):
+                entry = dict(state)
+                entry['time'] = time
+                yield entry
+    
+    def to_list(self):
+        '''Return the profile as a list of profile dictionaries'''
+        return list(self)
+    
+    def to_columns(self):
+        '''Return the profile expanded into a ProfileColumns object'''
+        cols = ProfileColumns(self.alarm_decoder)
+        n = 0
+        for (start, count, depth, temp, mask) in zip(self.start, self.count, self.depth, self.temp, self.alarms):
+            cols.append_run(start, count, depth, temp, mask,
+                self.depth_start is not None and n >= self.depth_start,
+                self.temp_start is not None and n >= self.temp_start)
+            n += count
+        return cols
+
+class ProfileSummary(object):
+    '''
+    Smart dive profile summary
+    
+    Accumulates summary statistics of a profile while it is decoded, without
+    storing the samples.  It accepts the same append_run() calls as the
+    ProfileColumns and ProfileRuns sinks, and is normally filled alongside
+    one of them by passing it as the 'summary' argument of the parser's
+    profile methods.  Only samples with a valid depth or temperature are
+    counted.
+    
+    To keep the cost per run low, only the number of samples at each depth,
+    the temperature range and the largest depth changes are kept; to_dict()
+    derives the following statistics from them, in the integer units of the
+    profile:
+    
+    max_depth: Maximum depth [cm]
+    avg_depth: Time-weighted average depth [cm]
+    min_temp: Minimum temperature [0.1 deg C]
+    max_temp: Maximum temperature [0.1 deg C]
+    max_ascent_rate: Maximum ascent rate between two samples [cm/min]
+    max_descent_rate: Maximum descent rate between two samples [cm/min]
+    bottom_time: Time spent deeper than surface_depth [s]
+    histogram: Time spent in each depth bin [s], where histogram[i] is the
+        time spent between i * bin_size and (i + 1) * bin_size cm
+    '''
+    def __init__(self, bin_size=100, surface_depth=100):
+        self.bin_size = bin_size
+        self.surface_depth = surface_depth
+        
+        self.depth_samples = {}
+        self.min_temp = None
+        self.max_temp = None
+        self.max_ascent = 0
+        self.max_descent = 0
+        
+        self._last_depth = None
+    
+    def append_run(self, time, count, depth, temp, alarms, has_depth=True, has_temp=True):
+        '''Add count samples taken every 4 seconds with the same values'''
+        if has_depth:
+            # Depth only changes between runs, over one 4 second interval
+            last = self._last_depth
+            if depth != last:
+                if last is not None:
+                    if depth - last > self.max_descent:
+                        self.max_descent = depth - last
+                    elif last - depth > self.max_ascent:
+                        self.max_ascent = last - depth
+                self._last_depth = depth
+            
+            self.depth_samples[depth] = self.depth_samples.get(depth, 0) + count
+        
+        if has_temp:
+            if self.min_temp is None:
+                self.min_temp = self.max_temp = temp
+            elif temp < self.min_temp:
+                self.min_temp = temp
+            elif temp > self.max_temp:
+                self.max_temp = temp
+    
+    def add_columns(self, cols):
+        '''
+        Add the samples of a ProfileColumns object
+        
+        Uses vectorized NumPy operations if NumPy is installed, and otherwise
+        adds the samples one at a time.
+        '''
+        n = len(cols)
+        depth_start = n if cols.depth_start is None else cols.depth_start
+        temp_start = n if cols.temp_start is None else cols.temp_start
+        
+        if numpy is None:
+            for i in xrange(n):
+                self.append_run(cols.time[i], 1, cols.depth[i], cols.temp[i],
+                    cols.alarms[i], i >= depth_start, i >= temp_start)
+            return
+        
+        if depth_start < n:
+            depth = numpy.frombuffer(cols.depth, dtype=numpy.intc)[depth_start:].astype(numpy.int64)
+            if self._last_depth is not None:
+                diff = numpy.diff(numpy.concatenate(([self._last_depth], depth)))
+            else:
+                diff = numpy.diff(depth)
+            
+            if len(diff):
+                self.max_descent = max(self.max_descent, int(diff.max()))
+                self.max_ascent = max(self.max_ascent, -int(diff.min()))
+            self._last_depth = int(depth[-1])
+            
+            (values, counts) = numpy.unique(depth, return_counts=True)
+            for (d, k) in zip(values.tolist(), counts.tolist()):
+                self.depth_samples[d] = self.depth_samples.get(d, 0) + k
+        
+        if temp_start < n:
+            temp = numpy.frombuffer(cols.temp, dtype=numpy.intc)[temp_start:]
+            tmin = int(temp.min())
+            tmax = int(temp.max())
+            self.min_temp = tmin if self.min_temp is None else min(self.min_temp, tmin)
+            self.max_temp = tmax if self.max_temp is None else max(self.max_temp, tmax)
+    
+    def to_dict(self):
+        '''Return the summary statistics as a dictionary'''
+        nsamples = sum(self.depth_samples.itervalues())
+        total = sum(d * k for (d, k) in self.depth_samples.iteritems())
+        
+        histogram = []
+        for (d, k) in self.depth_samples.iteritems():
+            b = max(d, 0) // self.bin_size
+            if b >= len(histogram):
+                histogram.extend([0] * (b + 1 - len(histogram)))
+            histogram[b] += 4 * k
+        
+        return {
+            'max_depth':        max(self.depth_samples) if nsamples else None,
+            'avg_depth':        (total + nsamples // 2) // nsamples if nsamples else None,
+            'min_temp':         self.min_temp,
+            'max_temp':         self.max_temp,
+            'max_ascent_rate':  self.max_ascent * 15,
+            'max_descent_rate': self.max_descent * 15,
+            'bottom_time':      4 * sum(k for (d, k) in self.depth_samples.iteritems() if d > self.surface_depth),
+            'histogram':        histogram,
+        }
+
+class ParseStats(object):
+    '''
+    Smart parser statistics collector
+    
+    Collects decoding statistics when passed to the parse() method of a Smart
+    parser with the 'stats' keyword argument, accumulating over every dive it
+    is passed to.  The DTIs are counted by the decoder which parses the 
+    profile, using a variant of the generated decoder with a counter per DTI
+    index (see BaseSmartParser.counting_decoder()), so parsing without a 
+    collector is unaffected.  Lazy profiles are not decoded by parse(), so 
+    only their headers are counted.
+    
+    dives: Number of dives parsed
+    dti_counts: Number of DTIs of each kind (e.g. 'delta_depth')
+    dti_bytes: Number of profile bytes consumed by DTIs of each kind
+    header_bytes: Number of header bytes read
+    profile_bytes: Number of profile bytes read
+    samples: Number of profile samples emitted
+    sign_fixes: Number of DTI values which were sign-extended
+    header_time: Time spent parsing headers [s]
+    profile_time: Time spent parsing profiles [s]
+    '''
+    def __init__(self):
+        self.dives = 0
+        self.dti_counts = {}
+        self.dti_bytes = {}
+        self.header_bytes = 0
+        self.profile_bytes = 0
+        self.samples = 0
+        self.sign_fixes = 0
+        self.header_time = 0.0
+        self.profile_time = 0.0
+    
+    def record_profile(self, parser, counts, nbytes, nsamples):
+        '''
+        Add the DTI counts of a decoded profile
+        
+        The counts argument is the list of DTI counts by index in the parser's
+        DTI table, and nbytes and nsamples are the size of the profile and 
+        the number of samples decoded from it.
+        '''
+        for (dti, size, n) in zip(parser.DTI_TABLE, parser.dti_decoder().sizes, counts):
+            if not n:
+                continue
+            
+            kind = '%s_%s' % ('abs' if dti['abs'] else 'delta', dti['name'])
+            if dti['name'] == 'alarms' and dti['idx']:
+                kind += '%d' % dti['idx']
+            self.dti_counts[kind] = self.dti_counts.get(kind, 0) + n
+            self.dti_bytes[kind] = self.dti_bytes.get(kind, 0) + n * size
+            
+            # Relative depths and temperatures are sign-extended when decoded
+            if dti['name'] == 'pressure_depth' or (dti['name'] in ('depth', 'temp') and not dti['abs']):
+                self.sign_fixes += n
+        
+        self.profile_bytes += nbytes
+        self.samples += nsamples
+    
+    def report(self):
+        '''Return a printable summary of the statistics'''
+        lines = [
+            'Dives:          %d' % self.dives,
+            'Header:         %d bytes, %.2f ms' % (self.header_bytes, self.header_time * 1000),
+            'Profile:        %d bytes, %.2f ms' % (self.profile_bytes, self.profile_time * 1000),
+            'Samples:        %d' % self.samples,
+            'Sign Fixes:     %d' % self.sign_fixes,
+            '',
+            '%-16s%12s%12s' % ('DTI', 'Count', 'Bytes'),
+        ]
+        for kind in sorted(self.dti_counts, key=lambda k: -self.dti_counts[k]):
+            lines.append('%-16s%12d%12d' % (kind, self.dti_counts[kind], self.dti_bytes[kind]))
+        
+        return '\n'.join(lines)
+
 class SmartAdapter(BaseAdapter):
-    def __init__(self, data):
+    '''
+    Uwatec Smart adapter
+    
+    If fixed_point is True, the profile depths and temperatures are returned
+    as the integer centimeters and tenths of a degree Celsius logged by the
+    computer instead of being converted to floating-point meters and degrees,
+    and profile_scale() returns the scale of each.
+    
+    Alarms are named with the ALARM_TABLE of the registered parser named in
+    the 'parser' key of the parse result.
+    '''
+    def __init__(self, data, fixed_point=False):
         super(SmartAdapter, self).__init__(data)
+        self._fixed_point = fixed_point
         self._profile = None
+        self._alarm_decoder = self.parser_alarm_decoder(data.get('parser'))
+        self._alarm_strings = {0: ''}
+    
+    @staticmethod
+    def parser_alarm_decoder(name):
+        '''Return the alarm decoder of a registered Smart parser'''
+        p = list_parsers().get(name)
+        if p is None or not hasattr(p['class'], 'alarm_decoder'):
+            return AlarmDecoder()
+        return p['class'].alarm_decoder()
+    
+    def alarm_string(self, mask):
+        '''Return the comma-separated alarm names for an alarm bitmask'''
+        try:
+            return self._alarm_strings[mask]
+        except KeyError:
+            s = ','.join(self._alarm_decoder.names(mask))
+            self._alarm_strings[mask] = s
+            return s
+    
+    def _scaled(self, key, scale):
+        '''
+        Return a header value divided by scale, or None if not logged
+        
+        Values which the model does not log in the header are taken from the
+        profile summary, if the dive has one.
+        '''
+        value = self._data.get(key)
+        if value is None:
+            value = (self._data.get('summary') or {}).get(key)
+        if value is None:
+            return None
+        return float(value)/scale
     
     def dive_datetime(self):
-        return self._data['date'] + datetime.timedelta(seconds = 60*15*(self._data['utc_offset'] or 0))
+        return self._data['date'] + datetime.timedelta(seconds = 60*15*(self._data.get('utc_offset') or 0))
     
+    # Not all Smart models log the repetitive dive number or surface interval
     def repetition(self):
-        return self._data['rep_no']
+        return self._data.get('rep_no')
     
     def interval(self):
-        return self._data['interval']
+        return self._data.get('interval')
     
     def duration(self):
         return self._data['duration']
 
     def max_depth(self):
-        return float(self._data['max_depth'])/100
+        return self._scaled('max_depth', 100)
     
     def avg_depth(self):
-        return float(self._data['avg_depth'])/100
+        return self._scaled('avg_depth', 100)
     
     def air_temp(self):
-        return float(self._data['air_temp'])/10
+        return self._scaled('air_temp', 10)
     
     def max_temp(self):
-        return float(self._data['max_temp'])/10
+        return self._scaled('max_temp', 10)
     
     def min_temp(self):
-        return float(self._data['min_temp'])/10
+        return self._scaled('min_temp', 10)
         
     def mixes(self):
-        return {
-            'gas_1': {
-                'n2':   100-self._data['ppO2_1'],
-                'o2':       self._data['ppO2_1'],
-                'he':   0,
-                'h2':   0,
-                'ar':   0
-            },
-            
-            'gas_2': {
-                'n2':   100-self._data['ppO2_2'],
-                'o2':       self._data['ppO2_2'],
-                'he':   0,
-                'h2':   0,
-                'ar':   0
-            },
-            
-            'gas_d': {
-                'n2':   100-self._data['ppO2_3'],
-                'o2':       self._data['ppO2_3'],
-                'he':   0,
-                'h2':   0,
-                'ar':   0
-            },
-        }
+        mixes = {}
+        for (mix, key) in [('gas_1', 'ppO2_1'), ('gas_2', 'ppO2_2'), ('gas_d', 'ppO2_3')]:
+            if key in self._data:
+                mixes[mix] = {
+                    'n2':   100-self._data[key],
+                    'o2':       self._data[key],
+                    'he':   0,
+                    'h2':   0,
+                    'ar':   0
+                }
+        return mixes
         
     def profile(self):
         if not self._profile:
-            self._profile = []
-            for wp in self._data['profile']:
-                if 'alarms' in wp:
-                    alarms = ','.join(wp['alarms'])
-                else:
-                    alarms = ''
-                                
-                self._profile.append({
-                    'time':     wp['time'],
-                    'depth':    float(wp['depth'])/100,
-                    'temp':     float(wp['temp'])/10,
+            if self._fixed_point:
+                self._profile = self._scaled_profile(1, 1)
+            else:
+                self._profile = self._scaled_profile(100, 10)
+        
+        return self._profile
+    
+    def _sample_runs(self):
+        '''
+        Return the profile as a list of runs of identical samples
+        
+        Returns (times, depth, temp, alarms) tuples for list, ProfileColumns 
+        and ProfileRuns profiles alike, where times is a sequence of sample
+        times which share the same values, and the depth or temperature is 
+        None for samples before the first absolute depth or temperature (or
+        where the key is missing from a list profile).
+        '''
+        profile = self._data['profile']
+        
+        if not isinstance(profile, (ProfileColumns, ProfileRuns)):
+            return [((wp['time'],), wp.get('depth'), wp.get('temp'), wp.get('alarms', 0)) for wp in profile]
+        
+        n = len(profile)
+        depth_start = n if profile.depth_start is None else profile.depth_start
+        temp_start = n if profile.temp_start is None else profile.temp_start
+        
+        # Read column-oriented profiles without creating sample dicts
+        if isinstance(profile, ProfileColumns):
+            return zip([(time,) for time in profile.time], 
+                [None] * depth_start + list(profile.depth[depth_start:]),
+                [None] * temp_start + list(profile.temp[temp_start:]),
+                profile.alarms)
+        
+        # Expand run-length encoded profiles one run at a time
+        runs = []
+        i = 0
+        for (start, count, depth, temp, mask) in zip(profile.start, profile.count, profile.depth, profile.temp, profile.alarms):
+            runs.append((xrange(start, start + 4 * count, 4), depth if i >= depth_start else None, 
+                temp if i >= temp_start else None, mask))
+            i += count
+        return runs
+    
+    def _scaled_profile(self, depth_div, temp_div):
+        '''
+        Return the profile with depths and temperatures divided by depth_div
+        and temp_div
+        
+        Divisors of 1 return the integer centimeters and tenths of a degree
+        logged by the computer, otherwise values are converted to floats.
+        '''
+        profile = []
+        for (times, depth, temp, mask) in self._sample_runs():
+            if depth is not None:
+                depth = int(depth) if depth_div == 1 else float(depth)/depth_div
+            if temp is not None:
+                temp = int(temp) if temp_div == 1 else float(temp)/temp_div
+            alarms = self.alarm_string(mask)
+            
+            for time in times:
+                profile.append({
+                    'time':     time,
+                    'depth':    depth,
+                    'temp':     temp,
                     'alarms':   alarms,
                 })
-                
-        return self._profile
+        
+        return profile
+    
+    def profile_scale(self):
+        if self._fixed_point:
+            return {'depth': 100, 'temp': 10}
+        return None
     
     def vendor(self):
         return {
-            'mode':                 self._data['mode'],
-            'battery':              self._data['batt'],
-            'alarms':               self._data['alarms'],
-            'microbubble_level':    self._data['mbLevel'],
+            'mode':                 self._data.get('mode'),
+            'battery':              self._data.get('batt'),
+            'alarms':               self._data.get('alarms'),
+            'microbubble_level':    self._data.get('mbLevel'),
         }
     
     def computer(self):
         return {
             'vendor':               'Uwatec',
-            'model':                self._data['model'],
-            'driver':               self._data['driver'],
-            'serial':               self._data['serial'],
+            'model':                self._data.get('model'),
+            'driver':               self._data.get('driver'),
+            'serial':               self._data.get('serial'),
         }
 
 class BaseSmartParser(BaseParser):
@@ -138,8 +1091,94 @@ class BaseSmartParser(BaseParser):
     Abstract Base Class for Uwatec Smart device parsers
     
     Implements common unpacking methods to retrieve signed and unsigned numbers
-    and to convert timestamps into date/time values
+    and to convert timestamps into date/time values, and the shared profile
+    decoding engine.  Each Smart model is a subclass which only defines its 
+    data tables: DTI_TABLE, ALARM_TABLE, HEADER_SIZE and HEADER_LAYOUT.
+    
+    DTI names are 'depth', 'temp', 'time' and 'alarms', along with 
+    'pressure_depth' (combined delta tank pressure and delta depth), 
+    'pressure', 'rbt' and 'unknown'.  Tank pressure and remaining bottom time
+    DTIs are decoded but not yet included in the profile.
     '''    
+    # Parser version, which must be incremented whenever the parse result
+    # changes so that cached results are discarded (see divelog.dc.cache)
+    VERSION = 4
+    
+    # Use the vectorized NumPy profile decoder if NumPy is installed
+    USE_NUMPY = True
+    
+    # Parse options used by divelog.dc.parse_many() worker processes, which
+    # return column-oriented profiles as they pickle far faster than lists
+    WORKER_KWARGS = {'columns': True}
+    
+    # Number of profile bytes decoded at a time by iter_profile()
+    LAZY_CHUNK_SIZE = 256
+    
+    @classmethod
+    def dti_decoder(cls):
+        '''Return the compiled DTI decoder for this parser class'''
+        if cls.__dict__.get('_dti_decoder') is None:
+            cls._dti_decoder = DTIDecoder(cls.DTI_TABLE)
+        return cls._dti_decoder
+    
+    @classmethod
+    def run_decoder(cls):
+        '''Return the generated profile decoding function for this parser class'''
+        if cls.__dict__.get('_run_decoder') is None:
+            cls._run_decoder = staticmethod(cls.dti_decoder().compile_runs())
+        return cls._run_decoder
+    
+    @classmethod
+    def summary_decoder(cls):
+        '''
+        Get the Summary Decoder
+        
+        Returns the generated profile decoding function with the profile 
+        summary inlined (see DTIDecoder.compile_runs()), compiled once per 
+        parser class.
+        '''
+        if cls.__dict__.get('_summary_decoder') is None:
+            cls._summary_decoder = staticmethod(cls.dti_decoder().compile_runs(summary=True))
+        return cls._summary_decoder
+    
+    @classmethod
+    def counting_decoder(cls, summary=False):
+        '''
+        Get the Counting Decoder
+        
+        Returns the variant of run_decoder() (or of summary_decoder() if 
+        summary is True) which also counts the DTIs of each index (see 
+        ParseStats).  It is only compiled when statistics are first collected.
+        '''
+        attr = '_counting_summary_decoder' if summary else '_counting_run_decoder'
+        if cls.__dict__.get(attr) is None:
+            setattr(cls, attr, staticmethod(cls.dti_decoder().compile_runs(summary=summary, counts=True)))
+        return getattr(cls, attr)
+    
+    @classmethod
+    def on_register(cls):
+        '''Compile the DTI, header and alarm tables when the class is registered'''
+        cls.dti_decoder()
+        cls.run_decoder()
+        cls.summary_decoder()
+        cls.header_layout()
+        cls.alarm_decoder()
+        return True
+    
+    @classmethod
+    def header_layout(cls):
+        '''Return the compiled header layout for this parser class'''
+        if cls.__dict__.get('_header_layout') is None:
+            cls._header_layout = HeaderLayout(cls.HEADER_LAYOUT, cls.HEADER_SIZE)
+        return cls._header_layout
+    
+    @classmethod
+    def alarm_decoder(cls):
+        '''Return the alarm bitmask decoder for this parser class'''
+        if cls.__dict__.get('_alarm_decoder') is None:
+            cls._alarm_decoder = AlarmDecoder(cls.ALARM_TABLE)
+        return cls._alarm_decoder
+    
     def smart_ticks_to_datetime(self, ticks, utc_offset=None):
         '''Convert a Smart tick count to a UTC date/time'''
         td = datetime.timedelta(seconds = ticks / 2)
@@ -167,63 +1206,12 @@ class BaseSmartParser(BaseParser):
         '''Read an unsigned byte value from the data'''
         return struct.unpack_from('<B', data, offset)[0]
     
-    def smart_dti_identify(self, data, offset):
-        '''Return the number of '1' bits in the DTI'''
-        nbits = 0
-        for i in range(16):       # Assume 16 bytes max in a DTI
-            byte = self.read_ushort(data, offset + i)
-            for j in range(8):
-                mask = 1 << (7 - j)
-                if byte & mask == 0:
-                    return nbits
-                nbits += 1
-                
-        return -1
-    
-    def smart_fix_signbit(self, value, nbits):
-        if nbits == 0 or nbits > 32:
-            return 0
-        
-        sgnbit = (1 << (nbits - 1))
-        mask = (0xFFFFFFFF << nbits) & 0xFFFFFFFF
-        
-        if (value & sgnbit) == sgnbit:
-            return value | mask
-        return value & ~mask
-    
-    def process_dti(self, data, cur_pos, dti):
-        # Advance past initial DTI bytes if necessary
-        cur_pos += dti['bits'] / 8
-        nbits = 0
-        value = 0
-        n = dti['bits'] % 8
-        if n > 0:
-            nbits = 8 - n
-            value = (0xFF >> n) & self.read_ushort(data, cur_pos)
-            
-            if dti['ignore_type_bits']:
-                nbits = 0
-                value = 0
-            
-            cur_pos += 1
-        
-        # Ensure that we have enough bytes remaining
-        if cur_pos + dti['extra'] > len(data):
-            raise ParseError('Unexpected end of data')
-        
-        # Process data bytes
-        for _ in range(dti['extra']):
-            nbits += 8
-            value = value << 8
-            value += self.read_ushort(data, cur_pos)
-            cur_pos += 1
-    
-        # Fix the Sign Bit
-        svalue = self.smart_fix_signbit(value, nbits)
-        svalue = struct.unpack('<l', struct.pack('<L', int(svalue)))[0]
-        
-        # Return the Data
-        return (cur_pos, value, svalue)
+    def parse_header(self, data, offset=0):
+        '''Read all header fields defined in HEADER_LAYOUT'''
+        header = self.header_layout().unpack_from(data, offset)
+        for field in self.header_layout().datetime_fields:
+            header[field] = self.smart_ticks_to_datetime(header[field])
+        return header
     
     def init_parser(self):
         '''Initialize profile state'''
@@ -235,7 +1223,7 @@ class BaseSmartParser(BaseParser):
         self._state.time = 0
         self._state.complete = 0
         
-        self._state.alarms = []
+        self._state.alarms = 0
         self._state.cal = 0
         self._state.depth = 0
         self._state.temp = 0
@@ -244,98 +1232,373 @@ class BaseSmartParser(BaseParser):
         self._state.has_depth = False
         self._state.has_temp = False
         
-    def alarm_name(self, idx, mask, alarm_table=[]):
-        name = 'alarm%d_%d' % (idx, mask)
-        for a in alarm_table:
-            if a['idx'] == idx and a['mask'] == mask:
-                return a['name']
-        return name
-    
-    def update_alarms(self, idx, value, alarm_table=[]):
-        # Clear existing alarms
-        _a = self._state.alarms
-        for a in _a:
-            if a['idx'] == idx and (value & a['mask'] == 0):
-                self._state.alarms.remove(a)
-                
-        # Set new alarms
-        m = 1
-        while m <= value:
-            if value & m == m:
-                name = self.alarm_name(idx, m, alarm_table)
-                self._state.alarms.append({'idx': idx, 'mask': m, 'name': name})
-                
-            m = m << 1
+        # DTI counts by index, if statistics are collected (see ParseStats)
+        self._state.counts = None
     
-    def parse_dti(self, dti, value, svalue, profile, alarm_table=[]):
-        #log.debug('Processing DTI %s_%s' % ('abs' if dti['abs'] else 'delta', dti['name']))
+    def parse_profile(self, data, offset=0, end=None, summary=None):
+        '''
+        Parse the profile into a list of sample dictionaries
         
-        # Parse Temperature
-        if dti['name'] == 'temp':
-            if dti['abs']:
-                self._state.temp = value * 4
-                self._state.has_temp = True
-            else:
-                self._state.temp += svalue * 4
-        
-        # Parse Depth
-        elif dti['name'] == 'depth':
-            if dti['abs']:
-                self._state.depth = value * 2
-                if self._state.cal == 0:
-                    self._state.cal = self._state.depth
-                self._state.has_depth = True
-            else:
-                self._state.depth += svalue * 2
-            self._state.complete = 1
+        The profile is read in place from data[offset:end], so data may be 
+        any object accepted by byte_view() and is never copied.  If summary
+        is a ProfileSummary object, the profile statistics are added to it
+        during the same pass.
+        '''
+        if numpy is not None and self.USE_NUMPY:
+            return self.parse_profile_numpy(data, offset, end, summary).to_list()
+        
+        return self.decode_runs(ProfileColumns(self.alarm_decoder()), data, offset, end, summary).to_list()
+    
+    def iter_profile(self, data, offset=0, end=None):
+        '''
+        Iterate over the profile samples
+        
+        Generator version of parse_profile() which decodes the profile lazily
+        and yields one sample dictionary at a time, so that consumers which
+        need a single pass over the profile use constant memory.  The profile
+        is decoded LAZY_CHUNK_SIZE bytes at a time with the generated decoder
+        from run_decoder().  Each iterator decodes with its own copy of the 
+        parser state, so the parser may be used for other dives while the 
+        iterator is alive.
+        '''
+        if end is None:
+            end = len(data)
+        
+        _parser = copy.copy(self)
+        _parser.init_parser()
+        _state = _parser._state
+        _decoder = self.run_decoder()
         
-        # Parse Alarms
-        elif dti['name'] == 'alarms':
-            self.update_alarms(dti['idx'], value, alarm_table)
+        runs = []
+        append_run = lambda *run: runs.append(run)
         
-        # Parse Time
-        elif dti['name'] == 'time':
-            self._state.complete = value
+        pos = offset
+        while pos < end:
+            stop = min(pos + self.LAZY_CHUNK_SIZE, end)
+            try:
+                _decoder(data, pos, stop, _state, append_run)
+            except ParseError:
+                # Retry a DTI which straddles the end of the chunk
+                if stop == end or _state.pos == pos:
+                    raise
+            pos = _state.pos
             
-        # Unknown DTI
+            for (time, count, depth, temp, alarms, has_depth, has_temp) in runs:
+                for t in xrange(time, time + 4 * count, 4):
+                    entry = {'time': t}
+                    if has_temp:
+                        entry['temp'] = temp
+                    if has_depth:
+                        entry['depth'] = depth
+                    if alarms:
+                        entry['alarms'] = alarms
+                    yield entry
+            del runs[:]
+    
+    def parse_profile_columns(self, data, offset=0, end=None, summary=None):
+        '''
+        Parse the profile into a column-oriented ProfileColumns object
+        
+        Produces the same samples as parse_profile(), but stores them in 
+        array-backed columns instead of a list of dictionaries.
+        '''
+        return self.decode_runs(ProfileColumns(self.alarm_decoder()), data, offset, end, summary)
+    
+    def parse_profile_rle(self, data, offset=0, end=None, summary=None):
+        '''
+        Parse the profile into a run-length encoded ProfileRuns object
+        
+        A time DTI which fills N samples is stored as a single run instead of
+        N sample dictionaries.
+        '''
+        return self.decode_runs(ProfileRuns(self.alarm_decoder()), data, offset, end, summary)
+    
+    def decode_runs(self, profile, data, offset=0, end=None, summary=None, gaps=None):
+        '''
+        Decode the profile into runs of identical samples
+        
+        Calls profile.append_run() once for each DTI which emits samples, with
+        the start time and number of samples and the current state.  Uses the
+        generated decoder from run_decoder().  If summary is a ProfileSummary
+        object, each run is also added to it, using the decoder from 
+        summary_decoder().  Returns the profile object.
+        
+        If gaps is a list, decoding recovers from invalid or truncated DTIs
+        instead of raising a ParseError: the undecodable bytes are skipped 
+        one at a time until a DTI decodes again, and each skipped span is 
+        appended to gaps as a dictionary with the keys 'offset' and 'length'
+        (in bytes, relative to the start of data) and 'time' (the time of 
+        the first sample after the gap).  Samples decoded after a gap are 
+        relative to the state before it, so delta values may be offset until
+        the next absolute DTI.
+        
+        If the state has a list of DTI counts (see ParseStats), the decoder 
+        from counting_decoder() is used to add the DTIs decoded to it.
+        '''
+        if end is None:
+            end = len(data)
+        
+        counts = self._state.counts
+        if counts is not None:
+            decoder = self.counting_decoder(summary is not None)
+        elif summary is not None:
+            decoder = self.summary_decoder()
         else:
-            log.warning('Unrecognized DTI: %s' % (dti['name']))
+            decoder = self.run_decoder()
         
-        # Setup a Profile Entry
-        while self._state.complete > 0:
-            entry = {'time': self._state.time}
-            
-            if self._state.has_temp:
-                entry['temp'] = self._state.temp
-            
-            if self._state.has_depth:
-                entry['depth'] = self._state.depth - self._state.cal
-            
-            if len(self._state.alarms) > 0:    
-                entry['alarms'] = [a['name'] for a in self._state.alarms]
-            
-            profile.append(entry)
-            self._state.time += 4
-            self._state.complete -= 1
-            
-    def parse_profile(self, data):
-        _pos = 0
-        _profile = []
-        
-        while _pos < len(data):
-            # Identify the DTI
-            idx = self.smart_dti_identify(data, _pos)
-            if idx > len(self.DTI_TABLE):
-                raise ParseError('Invalid DTI index (%d)' % idx)
-            
-            # Process the DTI 
-            (_pos, value, svalue) = self.process_dti(data, _pos, self.DTI_TABLE[idx])
-            
-            # Parse the DTI Value into the Profile
-            self.parse_dti(self.DTI_TABLE[idx], value, svalue, _profile, self.ALARM_TABLE)
+        args = (profile.append_run,) if summary is None else (profile.append_run, summary)
+        if counts is not None:
+            args += (counts,)
+        
+        if gaps is None:
+            decoder(data, offset, end, self._state, *args)
+            return profile
+        
+        pos = offset
+        while pos < end:
+            try:
+                decoder(data, pos, end, self._state, *args)
+                break
+            except ParseError:
+                pos = self._state.pos
+                if gaps and gaps[-1]['offset'] + gaps[-1]['length'] == pos:
+                    gaps[-1]['length'] += 1
+                else:
+                    log.warning('Skipping invalid profile data at offset %d' % pos)
+                    gaps.append({'offset': pos, 'length': 1, 'time': self._state.time})
+                pos += 1
+        
+        return profile
+    
+    def parse_profile_numpy(self, data, offset=0, end=None, summary=None):
+        '''
+        Parse the profile using vectorized NumPy operations
+        
+        Returns the same samples as parse_profile() in a ProfileColumns object
+        (see numpy_columns()).  If summary is a ProfileSummary object, the 
+        statistics of the columns are added to it.
+        '''
+        _cols = self.numpy_columns(data, offset, end)
+        if summary is not None:
+            summary.add_columns(_cols)
+        return _cols
+    
+    def numpy_columns(self, data, offset=0, end=None):
+        '''
+        Decode the profile into columns using vectorized NumPy operations
+        
+        A single light pass over the data finds the DTI boundaries, indices and
+        raw values.  The sign bits are then fixed, the running depth and
+        temperature are computed with cumulative sums which restart at each
+        absolute DTI, and the samples are expanded with numpy.repeat.  Returns
+        the same samples as parse_profile() in a ProfileColumns object.
+        '''
+        if numpy is None:
+            raise RuntimeError('NumPy is not installed')
+        
+        _cols = ProfileColumns(self.alarm_decoder())
+        _decoder = self.dti_decoder()
+        
+        # Find the DTI Boundaries and Kinds
+        dtis = [(i, v) for (i, v, _) in _decoder.iterdecode(data, offset, end)]
+        if not dtis:
+            return _cols
+        
+        dtis = numpy.array(dtis, dtype=numpy.int64)
+        idx = dtis[:, 0]
+        value = dtis[:, 1]
+        n = len(idx)
+        
+        # Count the DTIs if statistics are collected (see ParseStats)
+        counts = getattr(getattr(self, '_state', None), 'counts', None)
+        if counts is not None:
+            for (i, k) in enumerate(numpy.bincount(idx, minlength=len(counts)).tolist()):
+                counts[i] += k
+        pos = numpy.arange(n)
+        
+        name = numpy.array([d['name'] for d in self.DTI_TABLE])[idx]
+        isabs = numpy.array([d['abs'] for d in self.DTI_TABLE], dtype=bool)[idx]
+        
+        # Fix the Sign Bits
+        sgnbit = numpy.array(_decoder.sign_bits, dtype=numpy.int64)[idx]
+        svalue = numpy.where(value & sgnbit, value - 2 * sgnbit, value)
+        
+        # Combined Pressure/Depth DTIs hold a signed 8-bit delta depth
+        is_pdepth = name == 'pressure_depth'
+        svalue = numpy.where(is_pdepth, ((value & 0xFF) ^ 0x80) - 0x80, svalue)
+        
+        def running(is_kind, scale):
+            '''Return the running value and the index of the last absolute DTI'''
+            is_abs = is_kind & isabs
+            step = numpy.where(is_abs, value, numpy.where(is_kind, svalue, 0)) * scale
+            total = numpy.cumsum(step)
+            last = numpy.maximum.accumulate(numpy.where(is_abs, pos, -1))
+            base = numpy.where(last >= 0, total[last] - step[last], 0)
+            return (total - base, last)
+        
+        # Running Depth and Temperature after each DTI
+        is_depth = (name == 'depth') | is_pdepth
+        (depth, last_depth) = running(is_depth, 2)
+        (temp, last_temp) = running(name == 'temp', 4)
+        
+        # The calibration depth is the first non-zero absolute depth
+        cal = numpy.zeros(n, dtype=numpy.int64)
+        first = numpy.flatnonzero(is_depth & isabs & (value != 0))
+        if len(first):
+            cal[first[0]:] = value[first[0]] * 2
+        
+        # Alarm bitmask after each DTI
+        alarms = numpy.zeros(n, dtype=numpy.int64)
+        is_alarm = name == 'alarms'
+        alarm_idx = numpy.array([d['idx'] for d in self.DTI_TABLE])[idx]
+        for a in numpy.unique(alarm_idx[is_alarm]):
+            last = numpy.maximum.accumulate(numpy.where(is_alarm & (alarm_idx == a), pos, -1))
+            alarms |= numpy.where(last >= 0, value[last], 0) << (8 * int(a))
+        
+        # Depth DTIs emit one sample, Time DTIs emit one per value
+        count = numpy.where(is_depth, 1, numpy.where(name == 'time', value, 0))
+        rep = numpy.repeat(pos, count)
+        if not len(rep):
+            return _cols
+        
+        _cols.time = array('i', (numpy.arange(len(rep)) * 4).astype(numpy.int32).tostring())
+        _cols.depth = array('i', (depth - cal)[rep].astype(numpy.int32).tostring())
+        _cols.temp = array('i', temp[rep].astype(numpy.int32).tostring())
+        _cols.alarms = array('i', alarms[rep].astype(numpy.int32).tostring())
+        
+        valid = numpy.flatnonzero(last_depth[rep] >= 0)
+        _cols.depth_start = int(valid[0]) if len(valid) else None
+        valid = numpy.flatnonzero(last_temp[rep] >= 0)
+        _cols.temp_start = int(valid[0]) if len(valid) else None
+        
+        return _cols
+    
+    def parse(self, data, *args, **kwargs):
+        '''
+        Parse a Dive
+        
+        Parses the header and profile of a single dive as returned by the
+        Smart driver, using the DTI_TABLE, ALARM_TABLE and HEADER_LAYOUT of
+        the parser class.  If the 'columns' keyword argument is True, the profile
+        is returned as a ProfileColumns object rather than a list of samples.
+        If the 'lazy_profile' keyword argument is True, the profile is returned
+        as a single-pass iterator (see iter_profile()) and is decoded as it is
+        consumed.  If the 'rle' keyword argument is True, the profile is 
+        returned as a run-length encoded ProfileRuns object.  If the 'stats'
+        keyword argument is a ParseStats object, decoding statistics for the
+        dive are added to it.  Any other keyword arguments are copied into the
+        returned dictionary, and the 'parser' key holds the parser name.
+        
+        Unless the 'summary' keyword argument is False, the profile statistics
+        (see ProfileSummary) are collected while the profile is decoded and are
+        returned as a dictionary in the 'summary' key.  Lazy profiles are not
+        decoded by parse() and have no summary.
+        
+        If the 'profile' keyword argument is False, only the header is parsed
+        and the profile is returned as an empty list.  This is much faster 
+        than a full parse, and is enough to identify and list dives (see 
+        divelog.dc.scan_headers()).
+        
+        If the 'recover' keyword argument is True, a profile which contains an
+        invalid DTI or ends in a truncated DTI is decoded again with the gaps
+        skipped (see decode_runs()) instead of raising a ParseError, and a dive
+        which is shorter than its header length is parsed as far as it goes.
+        The skipped spans are returned in the 'gaps' key, which is an empty 
+        list if the dive was decoded without errors.  Lazy profiles are not
+        recovered.
+        
+        The data may be a str, bytearray, memoryview, buffer or mmap object
+        (e.g. buffer(mm, start, length) for a dive inside a memory-mapped dump
+        file).  The header and profile are read in place without copying.
+        '''
+        columns = kwargs.pop('columns', False)
+        lazy_profile = kwargs.pop('lazy_profile', False)
+        rle = kwargs.pop('rle', False)
+        stats = kwargs.pop('stats', None)
+        summary = ProfileSummary() if kwargs.pop('summary', True) else None
+        profile = kwargs.pop('profile', True)
+        recover = kwargs.pop('recover', False)
+        
+        self.init_parser()
+        if stats is not None:
+            self._state.counts = [0] * len(self.DTI_TABLE)
+        
+        data = byte_view(data)
+        if len(data) < self.HEADER_SIZE:
+            raise ParseError("Dive data must be at least %d bytes" % self.HEADER_SIZE)
+        
+        _len = struct.unpack_from('<L', data, 4)[0]
+        _end = len(data)
+        
+        if _len != len(data):
+            if not recover or _len < self.HEADER_SIZE:
+                raise ParseError("Data length mismatch")
+            _end = min(_len, len(data))
+        
+        if stats is not None:
+            _t0 = time.time()
+        
+        dive = dict(kwargs)
+        dive.update(self.parse_header(data))
+        dive['parser']          = getattr(self, 'NAME', self.__class__.__name__)
+        
+        if stats is not None:
+            _t1 = time.time()
+        
+        _hsize = self.HEADER_SIZE
+        _gaps = []
+        if not profile:
+            dive['profile']     = []
+            summary = None
+        elif lazy_profile:
+            dive['profile']     = self.iter_profile(data, _hsize, _end)
+            summary = None
+        else:
+            try:
+                if rle:
+                    dive['profile'] = self.parse_profile_rle(data, _hsize, _end, summary)
+                elif columns and numpy is not None and self.USE_NUMPY:
+                    dive['profile'] = self.parse_profile_numpy(data, _hsize, _end, summary)
+                elif columns:
+                    dive['profile'] = self.parse_profile_columns(data, _hsize, _end, summary)
+                else:
+                    dive['profile'] = self.parse_profile(data, _hsize, _end, summary)
             
-        return _profile
+            except ParseError:
+                if not recover:
+                    raise
+                
+                # Decode again from the start, skipping the bad spans
+                self.init_parser()
+                if stats is not None:
+                    self._state.counts = [0] * len(self.DTI_TABLE)
+                if summary is not None:
+                    summary = ProfileSummary()
+                
+                _sink = ProfileRuns(self.alarm_decoder()) if rle else ProfileColumns(self.alarm_decoder())
+                self.decode_runs(_sink, data, _hsize, _end, summary, _gaps)
+                dive['profile'] = _sink if rle or columns else _sink.to_list()
         
+        if recover:
+            if _end < _len:
+                _time = None if lazy_profile else 4 * len(dive['profile'])
+                _gaps.append({'offset': _end, 'length': _len - _end, 'time': _time})
+            dive['gaps']        = _gaps
+        
+        if summary is not None:
+            dive['summary']     = summary.to_dict()
+        
+        if stats is not None:
+            _t2 = time.time()
+            stats.dives += 1
+            stats.header_bytes += _hsize
+            stats.header_time += _t1 - _t0
+            stats.profile_time += _t2 - _t1
+            if profile and not lazy_profile:
+                stats.record_profile(self, self._state.counts, _end - _hsize, len(dive['profile']))
+        
+        return dive
+
 class AladinTec2G(BaseSmartParser):
     # Magic Attributes for the register_parser method
     NAME = 'AladinTec2G'
@@ -360,68 +1623,182 @@ class AladinTec2G(BaseSmartParser):
         { 'idx': 0, 'mask': 2,  'name': 'ascent' },
         { 'idx': 0, 'mask': 4,  'name': 'bookmark' },
     ]
-        
-    def parse(self, data, *args, **kwargs):
-        self.init_parser()
-        
-        if len(data) < 116:
-            raise ParseError("Dive data must be at least 116 bytes")
-        
-        _len = struct.unpack_from('<L', data, 4)[0]
-        
-        if _len != len(data):
-            raise ParseError("Data length mismatch")
-    
-        dive = {'cmp' : [0, 0, 0, 0, 0, 0, 0, 0]}
-        dive.update(kwargs)
-        
-        dive['date']            = self.read_datetime(data, 8)            # offset 0x08 - 0x0b
-    #   dive['_unk1']           = self.read_ulong(data, 12)              # offset 0x0c - 0x0f
-        dive['utc_offset']      = self.read_sshort(data, 16)             # offset 0x10
-        dive['rep_no']          = self.read_ushort(data, 17)             # offset 0x11
-        dive['mbLevel']         = self.read_ushort(data, 18)             # offset 0x12
-    #   dive['_unk2']           = self.read_ushort(data, 19)             # offset 0x13
-        dive['alarms']          = self.read_uint(data, 20)               # offset 0x14 - 0x15
-        dive['max_depth']       = self.read_uint(data, 22)               # offset 0x16 - 0x17
-        dive['avg_depth']       = self.read_uint(data, 24)               # offset 0x18 - 0x19
-        dive['duration']        = self.read_uint(data, 26)               # offset 0x1a - 0x1b
-        dive['max_temp']        = self.read_uint(data, 28)               # offset 0x1c - 0x1d
-        dive['min_temp']        = self.read_uint(data, 30)               # offset 0x1e - 0x1f
-        dive['air_temp']        = self.read_uint(data, 32)               # offset 0x20 - 0x21
-        dive['ppO2_1']          = self.read_ushort(data, 34)             # offset 0x22
-        dive['ppO2_2']          = self.read_ushort(data, 35)             # offset 0x23
-        dive['ppO2_3']          = self.read_ushort(data, 36)             # offset 0x24
-        dive['batt']            = self.read_ushort(data, 37)             # offset 0x25
-    #   dive['_unk5']           = self.read_uint(data, 38)               # offset 0x26 - 0x27
-        dive['interval']        = self.read_uint(data, 40)               # offset 0x28 - 0x29
-        dive['cnsO2']           = self.read_uint(data, 42)               # offset 0x2a - 0x2b
-    #   dive['_unk6']           = self.read_uint(data, 44)               # offset 0x2c - 0x2d
-        dive['ppO2_max1']       = self.read_uint(data, 46)               # offset 0x2e - 0x2f
-        dive['ppO2_max2']       = self.read_uint(data, 48)               # offset 0x30 - 0x31
-        dive['ppO2_max3']       = self.read_uint(data, 50)               # offset 0x32 - 0x33
-    #   dive['_unk7']           = self.read_ulong(data, 52)              # offset 0x34 - 0x37
-        dive['desat_before']    = self.read_uint(data, 56)               # offset 0x38 - 0x39
-        dive['nofly_before']    = self.read_uint(data, 58)               # offset 0x3a - 0x3b
-        dive['mode']            = self.read_ulong(data, 60)              # offset 0x3c - 0x3f
-    #   dive['_unk9']           = self.read_uint(data, 64)               # offset 0x40 - 0x41
-    #   dive['_unk10']          = self.read_uint(data, 66)               # offset 0x42 - 0x43
-    #   dive['_unk11']          = self.read_ulong(data, 68)              # offset 0x44 - 0x47
-    #   dive['_unk12']          = self.read_ulong(data, 72)              # offset 0x48 - 0x4b
-    #   dive['_unk13']          = self.read_ulong(data, 76)              # offset 0x4c - 0x4f
-    #   dive['_unk14']          = self.read_uint(data, 80)               # offset 0x50 - 0x51
-    #   dive['_unk15']          = self.read_uint(data, 82)               # offset 0x52 - 0x53
-        dive['cmp'][0]          = self.read_ulong(data, 84)              # offset 0x54 - 0x57
-        dive['cmp'][1]          = self.read_ulong(data, 88)              # offset 0x58 - 0x5b
-        dive['cmp'][2]          = self.read_ulong(data, 92)              # offset 0x5c - 0x5f
-        dive['cmp'][3]          = self.read_ulong(data, 96)              # offset 0x60 - 0x63
-        dive['cmp'][4]          = self.read_ulong(data, 100)             # offset 0x64 - 0x67
-        dive['cmp'][5]          = self.read_ulong(data, 104)             # offset 0x68 - 0x6b
-        dive['cmp'][6]          = self.read_ulong(data, 108)             # offset 0x6c - 0x6f
-        dive['cmp'][7]          = self.read_ulong(data, 112)             # offset 0x70 - 0x73 
-        
-        dive['profile']         = self.parse_profile(data[116:])
-        
-        dive['_bin_header']     = base64.encodestring(data[0:116]).strip()
-        dive['_bin_profile']    = base64.encodestring(data[116:]).strip()
-        
-        return dive
+    
+    # Header Layout Table (field, offset, type, scale)
+    HEADER_SIZE = 116
+    HEADER_LAYOUT = [
+        ('date',            0x08,   'datetime', None),
+    #   ('_unk1',           0x0c,   'L',        None),
+        ('utc_offset',      0x10,   'b',        None),
+        ('rep_no',          0x11,   'B',        None),
+        ('mbLevel',         0x12,   'B',        None),
+    #   ('_unk2',           0x13,   'B',        None),
+        ('alarms',          0x14,   'H',        None),
+        ('max_depth',       0x16,   'H',        None),
+        ('avg_depth',       0x18,   'H',        None),
+        ('duration',        0x1a,   'H',        None),
+        ('max_temp',        0x1c,   'H',        None),
+        ('min_temp',        0x1e,   'H',        None),
+        ('air_temp',        0x20,   'H',        None),
+        ('ppO2_1',          0x22,   'B',        None),
+        ('ppO2_2',          0x23,   'B',        None),
+        ('ppO2_3',          0x24,   'B',        None),
+        ('batt',            0x25,   'B',        None),
+    #   ('_unk5',           0x26,   'H',        None),
+        ('interval',        0x28,   'H',        None),
+        ('cnsO2',           0x2a,   'H',        None),
+    #   ('_unk6',           0x2c,   'H',        None),
+        ('ppO2_max1',       0x2e,   'H',        None),
+        ('ppO2_max2',       0x30,   'H',        None),
+        ('ppO2_max3',       0x32,   'H',        None),
+    #   ('_unk7',           0x34,   'L',        None),
+        ('desat_before',    0x38,   'H',        None),
+        ('nofly_before',    0x3a,   'H',        None),
+        ('mode',            0x3c,   'L',        None),
+    #   ('_unk9',           0x40,   'H',        None),
+    #   ('_unk10',          0x42,   'H',        None),
+    #   ('_unk11',          0x44,   'L',        None),
+    #   ('_unk12',          0x48,   'L',        None),
+    #   ('_unk13',          0x4c,   'L',        None),
+    #   ('_unk14',          0x50,   'H',        None),
+    #   ('_unk15',          0x52,   'H',        None),
+        ('cmp',             0x54,   '8L',       None),
+    ]
+
+class AladinTec(BaseSmartParser):
+    # Magic Attributes for the register_parser method
+    NAME = 'AladinTec'
+    DESCRIPTION = 'Uwatec Aladin Tec parser'
+    ADAPTER = SmartAdapter
+    
+    # The Aladin Tec logs the same profile data as the Aladin Tec 2G, with a
+    # shorter header
+    DTI_TABLE = AladinTec2G.DTI_TABLE
+    ALARM_TABLE = AladinTec2G.ALARM_TABLE
+    
+    # Header Layout Table (field, offset, type, scale)
+    HEADER_SIZE = 108
+    HEADER_LAYOUT = [
+        ('date',            0x08,   'datetime', None),
+        ('utc_offset',      0x10,   'b',        None),
+        ('max_depth',       0x16,   'H',        None),
+        ('duration',        0x18,   'H',        None),
+        ('min_temp',        0x1a,   'H',        None),
+        ('max_temp',        0x1c,   'H',        None),
+        ('ppO2_1',          0x1e,   'B',        None),
+        ('air_temp',        0x20,   'H',        None),
+    ]
+
+class SmartPro(BaseSmartParser):
+    # Magic Attributes for the register_parser method
+    NAME = 'SmartPro'
+    DESCRIPTION = 'Uwatec Smart Pro parser'
+    ADAPTER = SmartAdapter
+    
+    # Data Type Identifier Table
+    DTI_TABLE = [
+        { 'name': 'depth',   'abs': False, 'idx': 0, 'bits': 1, 'ignore_type_bits': False, 'extra': 0 },    # 0ddd dddd
+        { 'name': 'temp',    'abs': False, 'idx': 0, 'bits': 2, 'ignore_type_bits': False, 'extra': 0 },    # 10dd dddd
+        { 'name': 'time',    'abs': True,  'idx': 0, 'bits': 3, 'ignore_type_bits': False, 'extra': 0 },    # 110d dddd
+        { 'name': 'alarms',  'abs': True,  'idx': 0, 'bits': 4, 'ignore_type_bits': False, 'extra': 0 },    # 1110 dddd
+        { 'name': 'depth',   'abs': False, 'idx': 0, 'bits': 5, 'ignore_type_bits': False, 'extra': 1 },    # 1111 0ddd dddd dddd
+        { 'name': 'temp',    'abs': False, 'idx': 0, 'bits': 6, 'ignore_type_bits': False, 'extra': 1 },    # 1111 10dd dddd dddd
+        { 'name': 'depth',   'abs': True,  'idx': 0, 'bits': 7, 'ignore_type_bits': True,  'extra': 2 },    # 1111 110d dddd dddd dddd dddd
+        { 'name': 'temp',    'abs': True,  'idx': 0, 'bits': 8, 'ignore_type_bits': False, 'extra': 2 },    # 1111 1110 dddd dddd dddd dddd
+    ]
+    
+    # Alarm Identifier Table
+    ALARM_TABLE = []
+    
+    # Header Layout Table (field, offset, type, scale)
+    HEADER_SIZE = 92
+    HEADER_LAYOUT = [
+        ('date',            0x08,   'datetime', None),
+        ('max_depth',       0x12,   'H',        None),
+        ('duration',        0x14,   'H',        None),
+        ('min_temp',        0x16,   'H',        None),
+        ('ppO2_1',          0x18,   'B',        None),
+    ]
+
+class SmartCom(BaseSmartParser):
+    # Magic Attributes for the register_parser method
+    NAME = 'SmartCom'
+    DESCRIPTION = 'Uwatec Smart Com parser'
+    ADAPTER = SmartAdapter
+    
+    # Data Type Identifier Table
+    DTI_TABLE = [
+        { 'name': 'pressure_depth', 'abs': False, 'idx': 0, 'bits': 1,  'ignore_type_bits': False, 'extra': 1 },   # 0ddd dddd dddd dddd
+        { 'name': 'rbt',            'abs': True,  'idx': 0, 'bits': 2,  'ignore_type_bits': False, 'extra': 0 },   # 10dd dddd
+        { 'name': 'temp',           'abs': False, 'idx': 0, 'bits': 3,  'ignore_type_bits': False, 'extra': 0 },   # 110d dddd
+        { 'name': 'pressure',       'abs': False, 'idx': 0, 'bits': 4,  'ignore_type_bits': False, 'extra': 1 },   # 1110 dddd dddd dddd
+        { 'name': 'depth',          'abs': False, 'idx': 0, 'bits': 5,  'ignore_type_bits': False, 'extra': 1 },   # 1111 0ddd dddd dddd
+        { 'name': 'temp',           'abs': False, 'idx': 0, 'bits': 6,  'ignore_type_bits': False, 'extra': 1 },   # 1111 10dd dddd dddd
+        { 'name': 'alarms',         'abs': True,  'idx': 0, 'bits': 7,  'ignore_type_bits': True,  'extra': 1 },   # 1111 110d dddd dddd
+        { 'name': 'time',           'abs': True,  'idx': 0, 'bits': 8,  'ignore_type_bits': False, 'extra': 1 },   # 1111 1110 dddd dddd
+        { 'name': 'depth',          'abs': True,  'idx': 0, 'bits': 9,  'ignore_type_bits': True,  'extra': 2 },   # 1111 1111 0ddd dddd dddd dddd dddd dddd
+        { 'name': 'pressure',       'abs': True,  'idx': 0, 'bits': 10, 'ignore_type_bits': True,  'extra': 2 },   # 1111 1111 10dd dddd dddd dddd dddd dddd
+        { 'name': 'temp',           'abs': True,  'idx': 0, 'bits': 11, 'ignore_type_bits': True,  'extra': 2 },   # 1111 1111 110d dddd dddd dddd dddd dddd
+        { 'name': 'rbt',            'abs': True,  'idx': 0, 'bits': 12, 'ignore_type_bits': True,  'extra': 1 },   # 1111 1111 1110 dddd dddd dddd
+    ]
+    
+    # Alarm Identifier Table
+    ALARM_TABLE = []
+    
+    # Header Layout Table (field, offset, type, scale)
+    HEADER_SIZE = 100
+    HEADER_LAYOUT = [
+        ('date',            0x08,   'datetime', None),
+        ('max_depth',       0x12,   'H',        None),
+        ('duration',        0x14,   'H',        None),
+        ('min_temp',        0x16,   'H',        None),
+        ('ppO2_1',          0x18,   'B',        None),
+        ('pressure_begin',  0x1e,   'H',        None),
+        ('pressure_end',    0x20,   'H',        None),
+    ]
+
+class SmartTec(BaseSmartParser):
+    # Magic Attributes for the register_parser method
+    NAME = 'SmartTec'
+    DESCRIPTION = 'Uwatec Smart Tec parser'
+    ADAPTER = SmartAdapter
+    
+    # Data Type Identifier Table
+    DTI_TABLE = [
+        { 'name': 'pressure_depth', 'abs': False, 'idx': 0, 'bits': 1,  'ignore_type_bits': False, 'extra': 1 },   # 0ddd dddd dddd dddd
+        { 'name': 'rbt',            'abs': True,  'idx': 0, 'bits': 2,  'ignore_type_bits': False, 'extra': 0 },   # 10dd dddd
+        { 'name': 'temp',           'abs': False, 'idx': 0, 'bits': 3,  'ignore_type_bits': False, 'extra': 0 },   # 110d dddd
+        { 'name': 'pressure',       'abs': False, 'idx': 0, 'bits': 4,  'ignore_type_bits': False, 'extra': 1 },   # 1110 dddd dddd dddd
+        { 'name': 'depth',          'abs': False, 'idx': 0, 'bits': 5,  'ignore_type_bits': False, 'extra': 1 },   # 1111 0ddd dddd dddd
+        { 'name': 'temp',           'abs': False, 'idx': 0, 'bits': 6,  'ignore_type_bits': False, 'extra': 1 },   # 1111 10dd dddd dddd
+        { 'name': 'alarms',         'abs': True,  'idx': 0, 'bits': 7,  'ignore_type_bits': True,  'extra': 1 },   # 1111 110d dddd dddd
+        { 'name': 'time',           'abs': True,  'idx': 0, 'bits': 8,  'ignore_type_bits': False, 'extra': 1 },   # 1111 1110 dddd dddd
+        { 'name': 'depth',          'abs': True,  'idx': 0, 'bits': 9,  'ignore_type_bits': True,  'extra': 2 },   # 1111 1111 0ddd dddd dddd dddd dddd dddd
+        { 'name': 'temp',           'abs': True,  'idx': 0, 'bits': 10, 'ignore_type_bits': True,  'extra': 2 },   # 1111 1111 10dd dddd dddd dddd dddd dddd
+        { 'name': 'pressure',       'abs': True,  'idx': 0, 'bits': 11, 'ignore_type_bits': True,  'extra': 2 },   # 1111 1111 110d dddd dddd dddd dddd dddd
+        { 'name': 'pressure',       'abs': True,  'idx': 1, 'bits': 12, 'ignore_type_bits': True,  'extra': 2 },   # 1111 1111 1110 dddd dddd dddd dddd dddd
+        { 'name': 'pressure',       'abs': True,  'idx': 2, 'bits': 13, 'ignore_type_bits': True,  'extra': 2 },   # 1111 1111 1111 0ddd dddd dddd dddd dddd
+        { 'name': 'rbt',            'abs': True,  'idx': 0, 'bits': 14, 'ignore_type_bits': True,  'extra': 1 },   # 1111 1111 1111 10dd dddd dddd
+    ]
+    
+    # Alarm Identifier Table
+    ALARM_TABLE = []
+    
+    # Header Layout Table (field, offset, type, scale)
+    HEADER_SIZE = 132
+    HEADER_LAYOUT = [
+        ('date',            0x08,   'datetime', None),
+        ('max_depth',       0x12,   'H',        None),
+        ('duration',        0x14,   'H',        None),
+        ('min_temp',        0x16,   'H',        None),
+        ('ppO2_1',          0x1c,   'B',        None),
+        ('ppO2_2',          0x1d,   'B',        None),
+        ('ppO2_3',          0x1e,   'B',        None),
+        ('pressure_begin',  0x22,   '3H',       None),
+        ('pressure_end',    0x28,   '3H',       None),
+    ]
+
+class SmartZ(SmartTec):
+    # Magic Attributes for the register_parser method
+    NAME = 'SmartZ'
+    DESCRIPTION = 'Uwatec Smart Z parser'
@@ -0,0 +1,127 @@
+# =============================================================================
+# 
+# Copyright (C) 2011 Asymworks, LLC.  All Rights Reserved.
+# www.pydivelog.com / info@pydivelog.com
+# 
+# This file is part of the Python divecomputer Package (python-divecomputer)
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# 
+# =============================================================================
+
+'''
+Transfer progress reporting
+
+Drivers report the progress of a transfer to a progress object, which may have
+any of the methods start(total), received(data), update(value) and finish().
+The ProgressReporter class wraps such an object so that drivers can call every
+method unconditionally, and coalesces the update() calls so that the progress
+object is updated at most max_rate times per second no matter how small the
+chunks received by the driver are.  If the progress object has a progress()
+method, it is also called with the throughput and estimated time remaining.
+'''
+
+import time
+
+class ProgressReporter(object):
+    '''
+    Coalescing transfer progress reporter
+    
+    Forwards start(), received() and finish() to the target progress object,
+    and forwards update() only when at least 1/max_rate seconds have passed
+    and the value has advanced by at least min_delta since the last forwarded
+    update.  The first and final values of the transfer are always forwarded.
+    Each forwarded update also calls target.progress(value, total, rate, eta)
+    if the target has a progress() method, where rate is the average transfer
+    rate in bytes per second and eta is the estimated number of seconds left
+    (or None if it is not yet known).
+    '''
+    def __init__(self, target=None, max_rate=30.0, min_delta=0, clock=time.time):
+        self.target = target
+        self.max_rate = max_rate
+        self.min_delta = min_delta
+        self.clock = clock
+        
+        self.total = 0
+        self.value = 0
+        self.updates = 0
+        
+        self._start_time = None
+        self._last_time = None
+        self._last_value = None
+    
+    @classmethod
+    def wrap(cls, target):
+        '''Return target if it is a ProgressReporter, otherwise wrap it'''
+        if isinstance(target, ProgressReporter):
+            return target
+        return cls(target)
+    
+    def _call(self, name, *args):
+        '''Call a method of the target if it has one'''
+        fn = getattr(self.target, name, None)
+        if callable(fn):
+            fn(*args)
+    
+    def start(self, total):
+        '''Start a transfer of total bytes'''
+        self.total = total
+        self.value = 0
+        self.updates = 0
+        self._start_time = self.clock()
+        self._last_time = None
+        self._last_value = None
+        self._call('start', total)
+    
+    def received(self, data):
+        '''Pass a chunk of received data to the target'''
+        self._call('received', data)
+    
+    def update(self, value):
+        '''Record the number of bytes transferred so far'''
+        self.value = value
+        now = self.clock()
+        if self._last_time is None or value >= self.total or \
+            (now - self._last_time >= 1.0 / self.max_rate and value - self._last_value >= self.min_delta):
+            self._report(now)
+    
+    def finish(self):
+        '''Finish the transfer, forwarding the last value if it is pending'''
+        if self._last_value != self.value:
+            self._report(self.clock())
+        self._call('finish')
+    
+    def rate(self, now=None):
+        '''Return the average transfer rate [bytes/s], or None'''
+        if self._start_time is None:
+            return None
+        elapsed = (now or self.clock()) - self._start_time
+        if elapsed <= 0:
+            return None
+        return self.value / elapsed
+    
+    def eta(self, now=None):
+        '''Return the estimated time remaining [s], or None'''
+        rate = self.rate(now)
+        if not rate:
+            return None
+        return max(self.total - self.value, 0) / rate
+    
+    def _report(self, now):
+        self._last_time = now
+        self._last_value = self.value
+        self.updates += 1
+        self._call('update', self.value)
+        self._call('progress', self.value, self.total, self.rate(now), self.eta(now))
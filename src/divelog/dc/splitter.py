@@ -0,0 +1,85 @@
+# =============================================================================
+# 
+# Copyright (C) 2011 Asymworks, LLC.  All Rights Reserved.
+# www.pydivelog.com / info@pydivelog.com
+# 
+# This file is part of the Python divecomputer Package (python-divecomputer)
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# 
+# =============================================================================
+
+'''
+Uwatec Smart dive splitter
+
+Splits the byte stream of a Smart transfer into the raw data of each dive.
+This is used by the Smart driver, which splits dives as they are received,
+and by the Smart encoder, which writes the dive header marker.
+'''
+
+import struct
+
+class SmartDiveSplitter(object):
+    '''
+    Incremental Smart dive splitter
+    
+    Splits the byte stream returned by a Smart transfer into individual dives.
+    Each dive starts with the A5A5 5A5A marker DWORD followed by the length of
+    the dive in bytes (including the marker and length).  Data may be passed
+    to feed() in chunks of any size as it is received; feed() returns the list
+    of dives which have been completed by the new data.  This implementation 
+    intentionally does not search for the marker in case there is a A5A5 5A5A 
+    DWORD buried in the profile or in other legitimate data (e.g. a timestamp).
+    This could occur sometime in 2024.  We are future-proof!
+    '''
+    HEADER = '\xa5\xa5\x5a\x5a'
+    
+    def __init__(self):
+        self._buf = bytearray()
+        self._ndives = 0
+    
+    def feed(self, data):
+        '''Add received data and return a list of completed dives'''
+        self._buf.extend(data)
+        
+        dives = []
+        _pos = 0
+        while len(self._buf) - _pos >= 8:
+            if self._buf[_pos:_pos+4] != self.HEADER:
+                raise RuntimeError('Invalid or corrupt dive data in %s.feed()' % self.__class__.__name__)
+            _len = struct.unpack_from('<L', buffer(self._buf), _pos+4)[0]
+            
+            if _len <= 0:
+                raise RuntimeError('Length of dive %d is zero or negative in %s.feed()' % (self._ndives+1, self.__class__.__name__))
+            if _pos + _len > len(self._buf):
+                break
+            
+            dives.append(str(self._buf[_pos:_pos+_len]))
+            self._ndives += 1
+            _pos += _len
+        
+        del self._buf[:_pos]
+        return dives
+    
+    def close(self):
+        '''Finish splitting, checking that no partial dive remains'''
+        if len(self._buf) > 4:
+            raise RuntimeError('Length of dive %d extends past received data in %s.close()' % (self._ndives+1, self.__class__.__name__))
+        self._buf = bytearray()
+    
+    @property
+    def pending(self):
+        '''Number of bytes received which are not part of a completed dive'''
+        return len(self._buf)
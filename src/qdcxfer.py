@@ -22,7 +22,7 @@
 # 
 # =============================================================================
 
-import sys, os, logging, time
+import sys, os, logging, tempfile, time
 from PySide import QtCore
 from PySide.QtCore import Qt, QAbstractListModel, QModelIndex, QObject, \
     QResource, QSettings, QThread
@@ -67,9 +67,11 @@ class TransferWorker(QObject):
     Given a Dive Computer object, connects and downloads all new dives since
     the last transfer.
     '''
+    aborted = QtCore.Signal()
     finished = QtCore.Signal()
     parsedDive = QtCore.Signal(models.Dive)
     progress = QtCore.Signal(int)
+    rate = QtCore.Signal(float, float)
     status = QtCore.Signal(str)
     started = QtCore.Signal(int)
     
@@ -78,11 +80,46 @@ class TransferWorker(QObject):
             self.worker = worker
         def update(self, value):
             self.worker.progress.emit(value)
+        def progress(self, value, total, rate, eta):
+            if rate is not None and eta is not None:
+                self.worker.rate.emit(rate, eta)
     
     def __init__(self, dc):
         super(TransferWorker, self).__init__()
         self._dc = dc
+        self._adapter_cls = None
+        
+    def emitDive(self, data, raw=None):
+        'Create a Dive from parsed dive data and the raw dive bytes'
+        dive = models.Dive()
+        dive.init_from_adapter(self._adapter_cls(data))
+        dive.computer = self._dc
+        
+        if raw is not None:
+            dive.raw = models.RawDive()
+            dive.raw.parser = self._dc.parser
+            dive.raw.data = str(raw)
+        
+        self.status.emit(self.tr('Parsed Dive: %s') % dive.dive_datetime.strftime('%x %X'))
+        if data.get('gaps'):
+            self.status.emit(self.tr('Warning: Skipped %d damaged section(s) of the profile') % len(data['gaps']))
+        self.parsedDive.emit(dive)
+        
+    def saveSpool(self, drv, spool):
+        'Save the received dives to a dump file which the file driver can import'
+        if not hasattr(drv, 'save_spool'):
+            return spool
+        
+        filename = os.path.splitext(spool)[0] + '.dump'
+        try:
+            drv.save_spool(spool, filename)
+        except Exception, e:
+            self.status.emit(self.tr('Error: Could not save the received dives (%s)') % e)
+            return spool
         
+        os.remove(spool)
+        return filename
+    
     @QtCore.Slot()
     def start(self):
         'Run the Transfer'
@@ -105,7 +142,7 @@ class TransferWorker(QObject):
             pa = self._dc.parser_args
             popts = [] if pa is None or pa == '' else pa.split(':')
             parser = p['class'](*popts)
-            adapter_cls = p['adapter']
+            self._adapter_cls = p['adapter']
             self.status.emit(self.tr('Loaded Parser "%s"') % self._dc.parser)
         except:
             self.status.emit(self.tr('Error: Cannot load parser "%s"') % self._dc.parser)
@@ -143,24 +180,66 @@ class TransferWorker(QObject):
         nbytes = drv.get_bytecount()
         self.status.emit('Transferring %d bytes...' % nbytes)
         self.started.emit(nbytes)
-        _dives = drv.transfer(TransferWorker.Reporter(self))
+        
+        reporter = TransferWorker.Reporter(self)
+        
+        # Received data is spooled to disk, and if the link drops the complete
+        # dives are kept and the token only advances past the last of them
+        (fd, spool) = tempfile.mkstemp(prefix='dcxfer-', suffix='.bin')
+        os.close(fd)
+        
+        # Dives are parsed as soon as they arrive.  Damaged profiles are
+        # recovered where possible, and dives which still fail to parse are
+        # reported without aborting the rest of the transfer, and the spool
+        # is saved as a dump file so that they are not lost when the token 
+        # moves past them.
+        ndives = 0
+        nfailed = 0
+        try:
+            for _dive in drv.iter_dives(reporter, spool=spool, salvage=True):
+                ndives += 1
+                try:
+                    self.emitDive(parser.parse(_dive, recover=True), _dive)
+                except Exception, e:
+                    nfailed += 1
+                    self.status.emit(self.tr('Error: Could not parse dive (%s)') % e)
+        
+        except Exception, e:
+            self.status.emit(self.tr('Error: Transfer failed (%s)') % e)
+            self.status.emit(self.tr('Received dives saved to %s (import with the File Driver)') % self.saveSpool(drv, spool))
+            
+            # Keep the dives already emitted only if the driver can resume 
+            # after them, otherwise the next transfer would download them again
+            if ndives and not getattr(drv, 'complete', True):
+                self._dc.token = drv.issue_token()
+                self.status.emit(self.tr('Warning: Kept %d complete dives') % ndives)
+            elif ndives:
+                self.status.emit(self.tr('Warning: Discarded %d dives') % ndives)
+                self.aborted.emit()
+            
+            drv.disconnect()
+            self.finished.emit()
+            return
+        
+        if nfailed:
+            self.status.emit(self.tr('Warning: %d dives could not be parsed') % nfailed)
+            self.status.emit(self.tr('Received dives saved to %s (import with the File Driver)') % self.saveSpool(drv, spool))
+        else:
+            os.remove(spool)
+        
+        complete = getattr(drv, 'complete', True)
         token = drv.issue_token()
-        self.status.emit('Transfer Finished (%d new dives)' % len(_dives))
         drv.disconnect()
         
-        # Parse Dive Data
-        for _dive in _dives:
-            dive = models.Dive()
-            dive.init_from_adapter(adapter_cls(parser.parse(_dive)))
-            dive.computer = self._dc
-            self.status.emit(self.tr('Parsed Dive: %s') % dive.dive_datetime.strftime('%x %X'))
-            self.parsedDive.emit(dive)
-        
         # Update Dive Computer Token
         self._dc.token = token
         
         # Finished Transferring
-        self.status.emit(self.tr('Transfer Successful'))
+        if complete:
+            self.status.emit('Transfer Finished (%d new dives)' % ndives)
+            self.status.emit(self.tr('Transfer Successful'))
+        else:
+            self.status.emit(self.tr('Warning: Transfer interrupted, kept %d complete dives') % ndives)
         self.finished.emit()
 
 class DiveComputersModel(QAbstractListModel):
@@ -422,10 +501,12 @@ class TransferPanel(QWidget):
         self.worker = TransferWorker(dc)
         thread.started.connect(self.worker.start, Qt.QueuedConnection)
         self.worker.moveToThread(thread)
+        self.worker.aborted.connect(self._transferAborted, Qt.QueuedConnection)
         self.worker.finished.connect(self._transferFinished, Qt.QueuedConnection)
         self.worker.finished.connect(self.worker.deleteLater, Qt.QueuedConnection)
         self.worker.finished.connect(thread.deleteLater, Qt.QueuedConnection)
         self.worker.progress.connect(self._transferProgress, Qt.QueuedConnection)
+        self.worker.rate.connect(self._transferRate, Qt.QueuedConnection)
         self.worker.started.connect(self._transferStart, Qt.QueuedConnection)
         self.worker.status.connect(self._transferStatus, Qt.QueuedConnection)
         
@@ -443,6 +524,7 @@ class TransferPanel(QWidget):
             self._pbTransfer.setMaximum(nBytes)
         else:
             self._pbTransfer.setMaximum(100)
+        self._pbTransfer.setFormat('%p%')
         self._pbTransfer.reset()
         
     @QtCore.Slot(int)
@@ -450,11 +532,21 @@ class TransferPanel(QWidget):
         'Transfer Thread Progress Event'
         self._pbTransfer.setValue(nTransferred)
         
+    @QtCore.Slot(float, float)
+    def _transferRate(self, rate, eta):
+        'Transfer Thread Rate Event'
+        self._pbTransfer.setFormat(self.tr('%%p%% (%.1f kB/s, %d:%02d remaining)') % (rate / 1024, eta // 60, eta % 60))
+    
     @QtCore.Slot(models.Dive)
     def _transferParsed(self, dive):
         'Transfer Thread Parsed Dive'
         self._logbook.session.add(dive)
         
+    @QtCore.Slot()
+    def _transferAborted(self):
+        'Transfer Thread Aborted'
+        self._logbook.session.rollback()
+    
     @QtCore.Slot()
     def _transferFinished(self):
         'Transfer Thread Finished'